@@ -0,0 +1,666 @@
+import math
+import os
+import random
+import statistics
+import tempfile
+import time
+
+import graph
+import maze
+import simulator
+import tablebase
+from mcts import MCTS
+from minimax import Minimax
+
+
+class UCSMinimax(Minimax):
+    """Minimax that plans every step with a fresh UCS, as before the distance tables"""
+
+    def next_step(self, start, target):
+        path = self.g.UCS(start, target)
+        return path[1] if len(path) > 1 else path[0]
+
+
+def scan_closest_coin(tiles, pacman):
+    """
+    Closest coin by a full scan of the tiles, as Minimax.closest_coin did before the coin index
+    :param tiles: maze
+    :param pacman: pacman position
+    :return: coin index
+    """
+    coin = math.inf
+    min_distance = math.inf
+
+    def convert_from_raw(raw_pos):
+        x = (raw_pos % 20) * 20 - 200
+        y = 180 - (raw_pos // 20) * 20
+        return x, y
+
+    pacman_vec = convert_from_raw(pacman)
+
+    for i, tile in enumerate(tiles):
+        if tile == 1:
+            coin_vec = convert_from_raw(i)
+            distance = math.sqrt(sum([(a - b) ** 2 for a, b in zip(coin_vec, pacman_vec)]))
+            if distance < min_distance:
+                coin = i
+                min_distance = distance
+
+    return coin
+
+
+def list_dfs(g, start, target):
+    """
+    DFS as Graph.DFS did before parent pointers: a list as the queue and the visited tiles as the path
+    The steps back between branches are left out, they could loop forever
+    :param g: graph.Graph
+    :param start: starting point
+    :param target: point with a prize
+    :return: list of visited indexes
+    """
+    path = []
+    q = [start]
+    while q:
+        v = q.pop(0)
+        if v not in path:
+            path.append(v)
+            if v == target:
+                return path
+            q = g.graph[v] + q
+    return None
+
+
+def play_moves(minimax, tiles, pacman, ghosts, moves):
+    """
+    Play a game and time every find_best_move call
+    :param minimax: agent
+    :param tiles: maze
+    :param pacman: pacman position
+    :param ghosts: list of ghosts positions
+    :param moves: maximum number of turns
+    :return: list of per-move latencies in seconds
+    """
+    latencies = []
+    state = minimax.new_state(tiles)
+    tiles[pacman] = 2
+    state.eat(pacman)
+    for _ in range(moves):
+        start = time.perf_counter()
+        pacman = minimax.find_best_move(tiles, pacman, ghosts, True, state=state)
+        # the coin is eaten straight after the move, as in simulator.play_game, so the end of the game is seen
+        if state.eat(pacman):
+            tiles[pacman] = 2
+        over = pacman in ghosts or not minimax.is_moves_left(state)
+        if not over:
+            ghosts = minimax.find_best_move(tiles, pacman, ghosts, False, state=state)
+        latencies.append(time.perf_counter() - start)
+        if over or pacman in ghosts:
+            break
+    return latencies
+
+
+def compare_move_latency(games=5, moves=20, seed=0):
+    """
+    Compare per-move latency of the UCS based agent and the table based one
+    :param games: number of seeded games
+    :param moves: maximum number of turns per game
+    :param seed: random seed for spawn positions
+    """
+    roads = graph.get_roads(graph.tiles)
+    rng = random.Random(seed)
+    spawns = [rng.sample(roads, 2) for _ in range(games)]
+
+    for name, agent in (('UCS', UCSMinimax), ('table', Minimax)):
+        start = time.perf_counter()
+        minimax = agent(graph.tiles[:])
+        setup = time.perf_counter() - start
+
+        latencies = []
+        for pacman, ghost in spawns:
+            latencies += play_moves(minimax, graph.tiles[:], pacman, [ghost], moves)
+
+        print(f"{name}: setup {setup * 1000:.2f} ms, {len(latencies)} moves, "
+              f"mean {statistics.mean(latencies) * 1000:.3f} ms, "
+              f"max {max(latencies) * 1000:.3f} ms per move")
+
+
+def compare_pruning(depths=(6, 8, 10), positions=5, seed=0):
+    """
+    Compare search effort of plain minimax and alpha-beta with move ordering and transposition table
+    :param depths: search depths to compare
+    :param positions: number of seeded positions
+    :param seed: random seed for the positions
+    """
+    roads = graph.get_roads(graph.tiles)
+    rng = random.Random(seed)
+    spawns = [rng.sample(roads, 2) for _ in range(positions)]
+
+    for depth in depths:
+        for pruning in (False, True):
+            minimax = Minimax(graph.tiles[:], depth=depth, pruning=pruning)
+            nodes = cutoffs = tt_hits = 0
+            start = time.perf_counter()
+            for pacman, ghost in spawns:
+                tiles = graph.tiles[:]
+                tiles[pacman] = 2
+                minimax.find_best_move(tiles, pacman, [ghost], True)
+                nodes += minimax.nodes
+                cutoffs += minimax.cutoffs
+                tt_hits += minimax.tt_hits
+            elapsed = (time.perf_counter() - start) / positions
+
+            print(f"depth {depth}, {'alpha-beta' if pruning else 'minimax'}: "
+                  f"{nodes // positions} nodes, {cutoffs // positions} cutoffs, "
+                  f"{tt_hits // positions} tt hits, {elapsed * 1000:.3f} ms per move")
+
+
+def compare_closest_coin(queries=2000, seed=0):
+    """
+    Compare the full tile scan with the coin index on mazes with fewer and fewer coins
+    :param queries: number of seeded queries per coin density
+    :param seed: random seed for pacman positions and eaten coins
+    """
+    roads = graph.get_roads(graph.tiles)
+    rng = random.Random(seed)
+    minimax = Minimax(graph.tiles[:])
+    minimax.g.build_rings()
+
+    for left in (1.0, 0.5, 0.1):
+        tiles = graph.tiles[:]
+        for road in rng.sample(roads, int(len(roads) * (1 - left))):
+            tiles[road] = 2
+        state = minimax.new_state(tiles)
+        positions = [rng.choice(roads) for _ in range(queries)]
+
+        start = time.perf_counter()
+        for pacman in positions:
+            scan_closest_coin(tiles, pacman)
+        scan = (time.perf_counter() - start) / queries
+
+        start = time.perf_counter()
+        for pacman in positions:
+            minimax.closest_coin(tiles, pacman, state)
+        index = (time.perf_counter() - start) / queries
+
+        print(f"{state.count} coins: scan {scan * 1e6:.2f} us, index {index * 1e6:.2f} us per query")
+
+
+def compare_parallel(workers=(1, 2, 4, 8), depth=10, positions=5, ghosts=3, seed=0):
+    """
+    Compare per-move latency of the serial search and the root-split parallel search
+    :param workers: numbers of worker processes to compare, 1 is the serial search
+    :param depth: search depth
+    :param positions: number of seeded positions
+    :param ghosts: number of ghosts
+    :param seed: random seed for the positions
+    """
+    roads = graph.get_roads(graph.tiles)
+    rng = random.Random(seed)
+    spawns = [rng.sample(roads, ghosts + 1) for _ in range(positions)]
+
+    for count in workers:
+        minimax = Minimax(graph.tiles[:], depth=depth, workers=count)
+        # start the workers and build their tables outside of the timing
+        minimax.find_best_move(graph.tiles[:], spawns[0][0], spawns[0][1:], True)
+
+        latencies = []
+        for pacman, *agents in spawns:
+            minimax.reset()
+            tiles = graph.tiles[:]
+            tiles[pacman] = 2
+            start = time.perf_counter()
+            minimax.find_best_move(tiles, pacman, agents, True)
+            minimax.find_best_move(tiles, pacman, agents, False)
+            latencies.append(time.perf_counter() - start)
+        minimax.close()
+
+        print(f"{count} workers: mean {statistics.mean(latencies) * 1000:.3f} ms per move")
+
+
+def compare_ghost_moves(ghost_counts=(1, 4, 16, 64), turns=20, seed=0):
+    """
+    Compare a UCS per ghost with one shared flow field as the number of ghosts grows
+    :param ghost_counts: numbers of ghosts
+    :param turns: number of Pacman moves
+    :param seed: random seed for the positions
+    """
+    g = graph.Graph(graph.tiles)
+    roads = graph.get_roads(graph.tiles)
+    rng = random.Random(seed)
+
+    for count in ghost_counts:
+        ghosts = [rng.choice(roads) for _ in range(count)]
+        pacman = [rng.choice(roads)]
+        for _ in range(turns):
+            pacman.append(rng.choice(g.graph[pacman[-1]]))
+
+        start = time.perf_counter()
+        for target in pacman:
+            for ghost in ghosts:
+                g.UCS(ghost, target)
+        ucs = (time.perf_counter() - start) / len(pacman)
+
+        field = graph.FlowField(g)
+        start = time.perf_counter()
+        for target in pacman:
+            field.update(target)
+            for ghost in ghosts:
+                field.next_step(ghost)
+        flow = (time.perf_counter() - start) / len(pacman)
+
+        print(f"{count} ghosts: UCS {ucs * 1000:.3f} ms, flow field {flow * 1000:.3f} ms per turn")
+
+
+def compare_replanning(games=5, ghosts=2, seed=0):
+    """
+    Replay recorded games and compare planning every ghost's path from scratch with UCS and A*
+    against one D* Lite planner per ghost that is repaired turn by turn, starting over whenever Pacman,
+    its goal, has moved or repairing that too
+    :param games: number of recorded games
+    :param ghosts: number of ghosts
+    :param seed: seed of the first game
+    """
+    results = simulator.run_games(games, seed, num_ghosts=ghosts, record=True)
+    g = graph.Graph(graph.tiles[:])
+
+    for name in ('UCS', 'AStar', 'DStarLite', 'DStarLite-repair'):
+        expanded = 0
+        turns = 0
+        start = time.perf_counter()
+        for result in results:
+            planners = None
+            for pacman, positions in result['trajectory']:
+                turns += 1
+                if name.startswith('DStarLite'):
+                    if planners is None:
+                        planners = [graph.DStarLite(g, ghost, pacman, name == 'DStarLite-repair')
+                                    for ghost in positions]
+                    for planner, ghost in zip(planners, positions):
+                        planner.replan(ghost, pacman)
+                else:
+                    for ghost in positions:
+                        getattr(g, name)(ghost, pacman)
+                        expanded += g.expanded
+            if planners is not None:
+                expanded += sum(planner.expanded for planner in planners)
+        elapsed = time.perf_counter() - start
+
+        print(f"{name}: {turns} turns, {expanded / turns:.1f} nodes expanded, "
+              f"{elapsed / turns * 1000:.3f} ms per turn")
+
+
+def compare_contracted(queries=2000, seed=0):
+    """
+    Compare UCS and A* on the tile graph with the same searches on the corridor-contracted graph
+    :param queries: number of seeded (start, target) pairs
+    :param seed: random seed for the pairs
+    """
+    g = graph.Graph(graph.tiles)
+    contracted = graph.ContractedGraph(g)
+    roads = graph.get_roads(graph.tiles)
+    rng = random.Random(seed)
+    pairs = [rng.sample(roads, 2) for _ in range(queries)]
+    print(f"{len(roads)} tiles, {len(contracted.nodes)} junctions and dead ends")
+
+    for method in ('UCS', 'AStar'):
+        for name, search in (('tiles', lambda s, t: getattr(g, method)(s, t)),
+                             ('contracted', lambda s, t: contracted.path(s, t, method))):
+            owner = g if name == 'tiles' else contracted
+            expanded = 0
+            start = time.perf_counter()
+            for s, t in pairs:
+                search(s, t)
+                expanded += owner.expanded
+            elapsed = (time.perf_counter() - start) / queries
+
+            print(f"{method} on {name}: {expanded / queries:.1f} nodes expanded, {elapsed * 1e6:.1f} us per query")
+
+
+def compare_grid_searches(sizes=(20, 100, 300), queries=50, seed=0):
+    """
+    Compare UCS and A* with Jump Point Search and the bidirectional searches on open grids
+    :param sizes: grid widths, the built-in maze is used for 20
+    :param queries: number of seeded (start, target) pairs per size
+    :param seed: random seed for the grids and pairs
+    """
+    rng = random.Random(seed)
+    for size in sizes:
+        tiles = graph.tiles if size == 20 else maze.random_grid(size, size, seed=seed)
+        g = graph.Graph(tiles, size)
+        roads = graph.get_roads(tiles)
+        pairs = [rng.sample(roads, 2) for _ in range(queries)]
+
+        for method in ('UCS', 'AStar', 'JPS', 'BiBFS', 'BiAStar'):
+            expanded = 0
+            start = time.perf_counter()
+            for s, t in pairs:
+                getattr(g, method)(s, t)
+                expanded += g.expanded
+            elapsed = (time.perf_counter() - start) / queries
+
+            print(f"{size}x{size} {method}: {expanded / queries:.1f} nodes expanded, "
+                  f"{elapsed * 1000:.3f} ms per query")
+
+
+def compare_bfs_dfs(sizes=(20, 40, 80, 120), queries=10, seed=0):
+    """
+    Compare BFS and DFS with parent pointers against the list based DFS as the maze grows
+    :param sizes: grid widths, the built-in maze is used for 20
+    :param queries: number of seeded (start, target) pairs per size
+    :param seed: random seed for the grids and pairs
+    """
+    rng = random.Random(seed)
+    for size in sizes:
+        tiles = graph.tiles if size == 20 else maze.random_grid(size, size, seed=seed)
+        g = graph.Graph(tiles, size)
+        roads = graph.get_roads(tiles)
+        pairs = [rng.sample(roads, 2) for _ in range(queries)]
+
+        times = {}
+        for name, search in (('list DFS', lambda s, t: list_dfs(g, s, t)), ('DFS', g.DFS), ('BFS', g.BFS)):
+            start = time.perf_counter()
+            for s, t in pairs:
+                search(s, t)
+            times[name] = (time.perf_counter() - start) / queries
+
+        print(f"{size}x{size}: " + ", ".join(f"{name} {elapsed * 1000:.3f} ms" for name, elapsed in times.items())
+              + f", DFS speedup {times['list DFS'] / times['DFS']:.1f}x")
+
+
+def compare_greedy_pacman(depths=(4, 8), budget=50, games=20, ghosts=2, seed=0):
+    """
+    Compare Pacman moves by the greedy best-first search with the full search
+    :param depths: search depths of the searching agents, the ghosts search to the same depth
+    :param budget: node budget of the greedy search
+    :param games: number of seeded games per agent
+    :param ghosts: number of ghosts
+    :param seed: seed of the first game
+    """
+    for depth in depths:
+        for name, greedy_budget in (('search', None), ('greedy', budget)):
+            minimax = Minimax(graph.tiles[:], depth=depth, greedy_budget=greedy_budget)
+            nodes = []
+            latencies = []
+            find_best_move = minimax.find_best_move
+
+            # time only the Pacman moves
+            def timed(tiles, pacman, agents, is_pacman, *args):
+                start = time.perf_counter()
+                move = find_best_move(tiles, pacman, agents, is_pacman, *args)
+                if is_pacman:
+                    latencies.append(time.perf_counter() - start)
+                    nodes.append(minimax.nodes)
+                return move
+
+            minimax.find_best_move = timed
+            results = [simulator.play_game(minimax, seed + i, num_ghosts=ghosts) for i in range(games)]
+            summary = simulator.summarize(results)
+
+            print(f"depth {depth} {name}: win rate {summary['win_rate']:.0%}, loss rate {summary['loss_rate']:.0%}, "
+                  f"{statistics.mean(nodes):.0f} nodes and {statistics.mean(latencies) * 1000:.3f} ms per Pacman move")
+
+
+def compare_batched_queries(sizes=(20, 60, 120), targets=(4, 16, 64), seed=0):
+    """
+    Compare one UCS per target with the batched multi_target and multi_source queries
+    :param sizes: grid widths, the built-in maze is used for 20
+    :param targets: numbers of targets (coins) or sources (ghosts) per query
+    :param seed: random seed for the grids and tiles
+    """
+    rng = random.Random(seed)
+    for size in sizes:
+        tiles = graph.tiles if size == 20 else maze.random_grid(size, size, seed=seed)
+        g = graph.Graph(tiles, size)
+        roads = graph.get_roads(tiles)
+
+        for count in targets:
+            source = rng.choice(roads)
+            others = rng.sample(roads, min(count, len(roads)))
+
+            start = time.perf_counter()
+            for target in others:
+                g.UCS(source, target)
+            ucs_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            g.multi_target(source, others)
+            target_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            g.multi_source(others, source)
+            source_time = time.perf_counter() - start
+
+            print(f"{size}x{size} {count} targets: UCS each {ucs_time * 1000:.3f} ms, "
+                  f"multi_target {target_time * 1000:.3f} ms, multi_source {source_time * 1000:.3f} ms")
+
+
+def compare_position_cache(games=10, depth=6, ghosts=2, tt_size=400000, seed=0):
+    """
+    Compare games searched cold with games that probe a disk table saved by an earlier run
+    :param games: number of seeded games
+    :param depth: search depth
+    :param ghosts: number of ghosts
+    :param tt_size: transposition table slots
+    :param seed: seed of the first game
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'tt.bin')
+        # an earlier run that saved its table, play_game would clear it between games
+        warmup = Minimax(graph.tiles[:], depth=depth, tt_size=tt_size)
+        for i in range(games):
+            rng = random.Random(seed + i)
+            spawns = [simulator.random_init(graph.tiles, rng) for _ in range(ghosts + 1)]
+            play_moves(warmup, graph.tiles[:], spawns[0], spawns[1:], 300)
+        warmup.save_table(path)
+        print(f"table: {len(warmup.tt)} of {warmup.tt.size} slots used, {warmup.tt.replaced} replaced")
+
+        for name, tt_path in (('cold', None), ('disk', path)):
+            start = time.perf_counter()
+            minimax = Minimax(graph.tiles[:], depth=depth, tt_size=tt_size, tt_path=tt_path, preload=True)
+            setup = time.perf_counter() - start
+
+            start = time.perf_counter()
+            probes = hits = 0
+            for i in range(games):
+                simulator.play_game(minimax, seed + i, num_ghosts=ghosts)
+                probes += minimax.tt.probes
+                hits += minimax.tt.hits
+            elapsed = time.perf_counter() - start
+
+            disk = f", disk hit rate {minimax.disk.hit_rate():.0%}" if minimax.disk is not None else ""
+            print(f"{name}: setup {setup * 1000:.1f} ms, {elapsed:.2f} s for {games} games, "
+                  f"memory hit rate {hits / probes:.0%}{disk}")
+            if minimax.disk is not None:
+                minimax.disk.close()
+
+
+def compare_tablebase(positions=200, depth=10, workers=1, seed=0):
+    """
+    Compare searching one-coin endgames with probing a tablebase
+    :param positions: number of seeded (pacman, ghost, coin) positions
+    :param depth: search depth of the searching agent
+    :param workers: processes generating the tablebase
+    :param seed: random seed for the positions
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'tablebase.bin')
+        start = time.perf_counter()
+        count = tablebase.generate(graph.tiles, path, 1, workers=workers)
+        print(f"tablebase: {count} coin sets in {time.perf_counter() - start:.1f} s, "
+              f"{os.path.getsize(path) / 2 ** 20:.1f} MiB")
+
+        rng = random.Random(seed)
+        roads = graph.get_roads(graph.tiles)
+        games = [rng.sample(roads, 3) for _ in range(positions)]
+        # a ghost guarding the last coin is a draw, those positions are left to the search
+        table = tablebase.Tablebase(path, graph.tiles)
+        games = [(pacman, ghost, coin) for (pacman, ghost, coin) in games
+                 if table.value(1 << table.road_index[coin], pacman, ghost)]
+        table.close()
+        print(f"{len(games)} of {positions} positions decided")
+
+        for name, table in (('search', None), ('tablebase', path)):
+            minimax = Minimax(graph.tiles[:], depth=depth, tablebase=table)
+            elapsed = 0
+            for pacman, ghost, coin in games:
+                tiles = [2 if tile else 0 for tile in graph.tiles]
+                tiles[coin] = 1
+                state = minimax.new_state(tiles)
+                start = time.perf_counter()
+                minimax.find_best_move(tiles, pacman, [ghost], True, state=state)
+                elapsed += time.perf_counter() - start
+            print(f"{name}: {elapsed / len(games) * 1000:.3f} ms per move")
+            if minimax.tablebase is not None:
+                minimax.tablebase.close()
+
+
+def compare_mcts(ghost_counts=(1, 3), budget=10, games=5, seed=0):
+    """
+    Compare Pacman played by Minimax and by MCTS with the same time budget against the same ghosts
+    :param ghost_counts: numbers of ghosts
+    :param budget: milliseconds per Pacman move
+    :param games: number of seeded games per agent
+    :param seed: seed of the first game
+    """
+    for ghosts in ghost_counts:
+        ghost_agent = Minimax(graph.tiles[:], depth=4)
+        for name, agent in (('minimax', Minimax(graph.tiles[:], depth=100)), ('mcts', MCTS(graph.tiles[:]))):
+            rollouts = []
+            find_best_move = agent.find_best_move
+
+            # only Pacman gets the budget, the ghosts search to a fixed depth
+            def timed(tiles, pacman, agents, is_pacman, _, state):
+                move = find_best_move(tiles, pacman, agents, is_pacman, budget, state)
+                if name == 'mcts':
+                    rollouts.append(agent.rollouts_per_second())
+                return move
+
+            agent.find_best_move = timed
+            results = [simulator.play_game(agent, seed + i, num_ghosts=ghosts, ghost_agent=ghost_agent)
+                       for i in range(games)]
+            summary = simulator.summarize(results)
+            speed = f", {statistics.mean(rollouts):.0f} rollouts/s" if rollouts else ""
+            print(f"{ghosts} ghosts {name}: win rate {summary['win_rate']:.0%}, loss rate {summary['loss_rate']:.0%}, "
+                  f"mean score {summary['mean_score']:.1f}{speed}")
+
+
+def tiled_maze(copies):
+    """
+    Tile the built-in maze to get a large one
+    :param copies: number of copies along each side
+    :return: (tiles, width)
+    """
+    rows = [graph.tiles[i:i + 20] for i in range(0, len(graph.tiles), 20)]
+    tiles = []
+    for _ in range(copies):
+        for row in rows:
+            tiles += row * copies
+    return tiles, 20 * copies
+
+
+def compare_maze_construction(sizes=(100, 200, 500)):
+    """
+    Compare Graph construction from the tile list with the CSR Maze on large mazes
+    :param sizes: maze widths, multiples of 20
+    """
+    print(f"Maze backend: {'numpy' if maze.np is not None else 'array'}")
+    for size in sizes:
+        tiles, width = tiled_maze(size // 20)
+
+        start = time.perf_counter()
+        graph.Graph(tiles, width)
+        graph_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        m = maze.Maze(tiles, width)
+        maze_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        m.to_graph()
+        adapter_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        m.get_roads()
+        m.count_coins()
+        m.wall_mask()
+        bulk_time = time.perf_counter() - start
+
+        print(f"{size}x{size}: Graph {graph_time * 1000:.1f} ms, Maze {maze_time * 1000:.1f} ms, "
+              f"Maze.to_graph {adapter_time * 1000:.1f} ms, roads/coins/walls {bulk_time * 1000:.1f} ms")
+
+
+def compare_generated_mazes(sizes=(100, 300, 1000), queries=5, seed=0):
+    """
+    Profile maze generation, Graph construction, the searches and a Minimax move on generated mazes
+    up to a million tiles; above graph.TABLE_LIMIT roads Minimax walks BFS fields instead of the all-pairs tables
+    :param sizes: maze widths and heights
+    :param queries: (start, target) pairs per maze
+    :param seed: random seed of the mazes and the pairs
+    """
+    for size in sizes:
+        start = time.perf_counter()
+        tiles = maze.generate(size, size, seed)
+        generate_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        g = graph.Graph(tiles, size)
+        graph_time = time.perf_counter() - start
+
+        roads = graph.get_roads(tiles)
+        rng = random.Random(seed)
+        pairs = [rng.sample(roads, 2) for _ in range(queries)]
+        searches = []
+        for search in ('BFS', 'UCS', 'AStar', 'JPS', 'BiBFS'):
+            method = getattr(g, search)
+            start = time.perf_counter()
+            for (u, v) in pairs:
+                method(u, v)
+            searches.append(f"{search} {(time.perf_counter() - start) / queries * 1000:.1f} ms")
+
+        start = time.perf_counter()
+        minimax = Minimax(tiles[:], depth=4, width=size)
+        minimax_time = time.perf_counter() - start
+        state = minimax.new_state(tiles)
+        pacman, ghost = pairs[0]
+        state.eat(pacman)
+        start = time.perf_counter()
+        minimax.find_best_move(tiles, pacman, [ghost], True, state=state)
+        move_time = time.perf_counter() - start
+
+        print(f"{size}x{size} ({len(roads)} roads): generate {generate_time * 1000:.0f} ms, "
+              f"Graph {graph_time * 1000:.0f} ms, " + ", ".join(searches) +
+              f", Minimax {minimax_time * 1000:.0f} ms + move {move_time * 1000:.0f} ms")
+
+
+if __name__ == '__main__':
+    compare_move_latency()
+    print("----")
+    compare_closest_coin()
+    print("----")
+    compare_maze_construction()
+    print("----")
+    compare_generated_mazes()
+    print("----")
+    compare_pruning()
+    print("----")
+    compare_parallel()
+    print("----")
+    compare_ghost_moves()
+    print("----")
+    compare_replanning()
+    print("----")
+    compare_contracted()
+    print("----")
+    compare_grid_searches()
+    print("----")
+    compare_bfs_dfs()
+    print("----")
+    compare_greedy_pacman()
+    print("----")
+    compare_batched_queries()
+    print("----")
+    compare_position_cache()
+    print("----")
+    compare_tablebase()
+    print("----")
+    compare_mcts()
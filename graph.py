@@ -1,29 +1,27 @@
 import collections
+from array import array
 from collections import defaultdict
+import heapq
+import math
 import random
-import queue as Q
 
-
-def is_acceptable(current, next):
-    """
-    check if the next tile is acceptable from the current in 1 step
-    :param current: current tile
-    :param next: next tile
-    :return: boolean
-    """
-    return abs(current - next) == 20 or abs(current - next) == 1
+# roads above which Minimax and MCTS walk cached BFS fields instead of building the all-pairs tables,
+# the tables take O(roads^2) time and memory
+TABLE_LIMIT = 500
 
 
-def add_back_road(path, tile):
+def trace_path(parent, node):
     """
-    return to the tile that is acceptable from the tile
-    :param path: list of indexes
-    :param tile: next tile index
+    Follow parent pointers back to the root of a search
+    :param parent: dict of parent pointers, the root points to None
+    :param node: last node of the path
+    :return: list of path indexes from the root to the node
     """
-    i = len(path) - 1
-    while not is_acceptable(path[i], tile):
-        path.append(path[i - 1])
-        i -= 1
+    path = []
+    while node is not None:
+        path.append(node)
+        node = parent[node]
+    return path[::-1]
 
 
 # This class represents a directed graph
@@ -31,261 +29,1182 @@ def add_back_road(path, tile):
 class Graph:
 
     # Constructor
-    def __init__(self, tiles, offset=20):
+    def __init__(self, tiles, width=20, adjacency=None):
         """
         create a graph from the 1d array
         :param tiles: 1d array with tiles
-        :param offset: row offset
+        :param width: row length, the number of tiles per row
+        :param adjacency: iterable of (tile, neighbours) pairs to use instead of scanning the tiles
         """
         # default dictionary to store graph
         self.graph = defaultdict(list)
+        # edge costs that differ from the default step cost of 1
+        self.costs = {}
         self.tiles = tiles
-        self.offset = offset
-
+        self.width = width
+
+        # all-pairs tables, built lazily by build_tables()
+        # with more than table_limit roads the queries walk BFS fields instead, None always builds the tables
+        self.table_limit = None
+        self.roads = None
+        self.road_index = None
+        self.unreachable = None
+        self.dist_table = None
+        self.next_table = None
+        # distance rings for nearest queries, built lazily by build_rings()
+        self.rings = None
+        # BFS fields toward the latest targets, used instead of the tables above table_limit
+        self.fields = collections.OrderedDict()
+        self.field_cache = 16
+        # incoming edges for multi_source, built lazily by reverse_graph()
+        self.reverse = None
+
+        if adjacency is not None:
+            for (u, neighbours) in adjacency:
+                self.graph[u].extend(neighbours)
+            return
+
+        last_row = len(tiles) - width
         for (i, tile) in enumerate(tiles):
             # if tile is a wall
             if tile != 1:
                 continue
 
-            # left
-            if i != 0:
+            column = i % width
+            # left, not across the start of the row
+            if column != 0:
                 left = i - 1
                 left_tile = tiles[left]
                 if left_tile != 0:
                     self.add_edge(i, left)
-            # right
-            if i != len(tiles) - 1:
+            # right, not across the end of the row
+            if column != width - 1:
                 right = i + 1
                 right_tile = tiles[right]
                 if right_tile != 0:
                     self.add_edge(i, right)
             # top
-            if i > offset:
-                top = i - offset
+            if i >= width:
+                top = i - width
                 top_tile = tiles[top]
                 if top_tile != 0:
                     self.add_edge(i, top)
 
             # bottom
-            if i > offset:
-                bottom = i + offset
+            if i < last_row:
+                bottom = i + width
                 bottom_tile = tiles[bottom]
                 if bottom_tile != 0:
                     self.add_edge(i, bottom)
 
-    def add_edge(self, u, v):
+    def add_edge(self, u, v, cost=1):
         """
         Add and edge to graph
         :param u: from
         :param v: to
+        :param cost: cost of the step, only stored when it is not the default 1
         """
         self.graph[u].append(v)
+        self.reverse = None
+        if cost != 1:
+            self.costs[(u, v)] = cost
+
+    def edge_cost(self, u, v):
+        """
+        Cost of the step from u to v
+        :param u: from
+        :param v: to
+        :return: edge cost, 1 if it was never set
+        """
+        return self.costs.get((u, v), 1)
+
+    def reverse_graph(self):
+        """
+        Tiles every tile can be entered from, built once and dropped by add_edge
+        :return: dict of lists
+        """
+        if self.reverse is None:
+            self.reverse = defaultdict(list)
+            for (u, neighbours) in list(self.graph.items()):
+                for v in neighbours:
+                    self.reverse[v].append(u)
+        return self.reverse
+
+    def batch_search(self, root, goals, adjacency, cost):
+        """
+        Dijkstra from root until every goal is settled
+        :param root: starting point
+        :param goals: tiles to settle
+        :param adjacency: dict of neighbours to follow
+        :param cost: step cost function (u, v) of a followed edge
+        :return: (distance, parent) dicts of the settled tiles
+        """
+        distance = {root: 0}
+        parent = {root: None}
+        settled = set()
+        remaining = set(goals)
+        queue = [(0, root)]
+        self.expanded = 0
+
+        while queue and remaining:
+            current_cost, current = heapq.heappop(queue)
+            if current in settled:
+                continue
+            settled.add(current)
+            remaining.discard(current)
+            self.expanded += 1
+
+            for neighbor in adjacency[current]:
+                new_cost = current_cost + cost(current, neighbor)
+                if neighbor not in settled and new_cost < distance.get(neighbor, math.inf):
+                    distance[neighbor] = new_cost
+                    parent[neighbor] = current
+                    heapq.heappush(queue, (new_cost, neighbor))
+
+        return distance, parent
+
+    def multi_target(self, source, targets):
+        """
+        Distances and next hops from one source to many targets in a single traversal
+        The arrays support the buffer protocol, numpy.frombuffer wraps them without a copy
+        :param source: starting point
+        :param targets: list of target tiles
+        :return: (distances, next_hops) arrays aligned with targets, -1 where a target is unreachable;
+        the next hop is the first tile after source on a shortest path, source itself for source
+        """
+        distance, parent = self.batch_search(source, targets, self.graph, self.edge_cost)
+
+        distances = array('q', [-1]) * len(targets)
+        next_hops = array('q', [-1]) * len(targets)
+        # first step of every tile on a traced path, shared by the targets behind it
+        first = {source: source}
+        for k, target in enumerate(targets):
+            if target not in distance:
+                continue
+            node = target
+            chain = []
+            while node not in first:
+                chain.append(node)
+                node = parent[node]
+            hop = first[node]
+            for node in reversed(chain):
+                hop = node if hop == source else hop
+                first[node] = hop
+            distances[k] = distance[target]
+            next_hops[k] = first[target]
+
+        return distances, next_hops
+
+    def multi_source(self, sources, target):
+        """
+        Distances and next hops from many sources to one target in a single traversal over the reversed edges
+        :param sources: list of starting tiles
+        :param target: point with a prize
+        :return: (distances, next_hops) arrays aligned with sources, -1 where the target is unreachable;
+        the next hop is the tile after the source on a shortest path, the target itself for the target
+        """
+        distance, parent = self.batch_search(target, sources, self.reverse_graph(),
+                                             lambda u, v: self.edge_cost(v, u))
 
-    def BFS(self, start, target):
+        distances = array('q', [-1]) * len(sources)
+        next_hops = array('q', [-1]) * len(sources)
+        for k, source in enumerate(sources):
+            if source in distance:
+                distances[k] = distance[source]
+                next_hops[k] = parent[source] if source != target else target
+
+        return distances, next_hops
+
+    def index_roads(self):
+        """
+        Number the roads in tile order, as the tables, the rings and the masks of nearest() do
+        """
+        if self.roads is None:
+            self.roads = [i for (i, tile) in enumerate(self.tiles) if tile != 0]
+            self.road_index = {road: k for (k, road) in enumerate(self.roads)}
+
+    def use_tables(self):
+        """
+        Build the all-pairs tables unless the maze has more than table_limit roads
+        :return: True if the queries read the tables, False if they walk BFS fields
+        """
+        if self.dist_table is None:
+            self.index_roads()
+            if self.table_limit is not None and len(self.roads) > self.table_limit:
+                return False
+            self.build_tables()
+        return True
+
+    def field(self, target):
+        """
+        Lazy BFS field toward a target, the latest field_cache of them are kept
+        :param target: tile index
+        :return: FlowField pointed at the target
+        """
+        field = self.fields.pop(target, None)
+        if field is None:
+            # the least recently used field is pointed at the new target, its buffers are reused
+            field = FlowField(self) if len(self.fields) < self.field_cache else self.fields.popitem(last=False)[1]
+            field.update(target)
+        self.fields[target] = field
+        return field
+
+    def build_tables(self):
+        """
+        Precompute all-pairs distances and next hops with a BFS from every road
+        Both tables are flat arrays indexed by road_index[u] * n + road_index[v]
+        """
+        self.index_roads()
+        roads = self.roads
+        n = len(roads)
+        typecode = 'H' if n < 0xFFFF else 'I'
+        unreachable = 0xFFFF if typecode == 'H' else 0xFFFFFFFF
+
+        road_index = self.road_index
+        # neighbours as road indexes, so the BFS below never touches the dict
+        neighbours = [[road_index[v] for v in self.graph[u] if v in road_index] for u in roads]
+
+        dist_table = array(typecode, [unreachable]) * (n * n)
+        next_table = array(typecode, [unreachable]) * (n * n)
+
+        for source in range(n):
+            row = source * n
+            dist_table[row + source] = 0
+            next_table[row + source] = source
+            queue = collections.deque()
+            # the first step of every path is the neighbour it started from
+            for v in neighbours[source]:
+                if dist_table[row + v] == unreachable:
+                    dist_table[row + v] = 1
+                    next_table[row + v] = v
+                    queue.append(v)
+            while queue:
+                u = queue.popleft()
+                dist = dist_table[row + u] + 1
+                first = next_table[row + u]
+                for v in neighbours[u]:
+                    if dist_table[row + v] == unreachable:
+                        dist_table[row + v] = dist
+                        next_table[row + v] = first
+                        queue.append(v)
+
+        self.unreachable = unreachable
+        self.dist_table = dist_table
+        self.next_table = next_table
+
+    def distance(self, u, v, limit=None):
+        """
+        Shortest distance between two tiles from the precomputed table, or from a BFS above table_limit
+        :param u: from
+        :param v: to
+        :param limit: distance worth telling apart, a longer one is returned as limit; a BFS stops there
+        :return: number of steps or None if v is unreachable from u (limit when a limit is given)
+        """
+        if not self.use_tables():
+            if limit is None:
+                return self.field(v).distance(u)
+            return self.bounded_distance(u, v, limit)
+        dist = self.dist_table[self.road_index[u] * len(self.roads) + self.road_index[v]]
+        if limit is not None:
+            return min(dist, limit)
+        return None if dist == self.unreachable else dist
+
+    def bounded_distance(self, u, v, limit):
+        """
+        BFS distance that gives up after limit steps
+        :param u: from
+        :param v: to
+        :param limit: steps searched
+        :return: number of steps, limit if v is further away or unreachable
+        """
+        seen = {u}
+        frontier = [u]
+        for dist in range(limit):
+            if v in seen:
+                return dist
+            frontier = self.expand_frontier(frontier, seen)
+        return limit
+
+    def expand_frontier(self, frontier, seen):
+        """
+        One BFS layer
+        :param frontier: tiles at the current distance
+        :param seen: tiles reached so far, the new layer is added to it
+        :return: list of the tiles one step further
+        """
+        layer = []
+        for u in frontier:
+            for w in self.graph[u]:
+                if w not in seen:
+                    seen.add(w)
+                    layer.append(w)
+        return layer
+
+    def next_step(self, u, v):
+        """
+        Next tile on a shortest path from u toward v from the precomputed table, or from a BFS field above table_limit
+        :param u: from
+        :param v: to
+        :return: tile index (u itself if u == v) or None if v is unreachable from u
+        """
+        if not self.use_tables():
+            return self.field(v).next_step(u)
+        step = self.next_table[self.road_index[u] * len(self.roads) + self.road_index[v]]
+        return None if step == self.unreachable else self.roads[step]
+
+    def build_rings(self):
+        """
+        Group the roads around every road by distance
+        rings[road_index[u]][d] is a bitset of the road indexes exactly d steps away from u
+        Nothing is built above table_limit, nearest() runs a BFS then
+        """
+        if not self.use_tables():
+            return
+        n = len(self.roads)
+        rings = []
+        for source in range(n):
+            row = source * n
+            ring = []
+            for v in range(n):
+                dist = self.dist_table[row + v]
+                if dist == self.unreachable:
+                    continue
+                while len(ring) <= dist:
+                    ring.append(0)
+                ring[dist] |= 1 << v
+            rings.append(ring)
+        self.rings = rings
+
+    def nearest(self, u, mask):
+        """
+        Nearest road by maze distance among a set of roads
+        Ties are broken by the lowest road index
+        :param u: from
+        :param mask: bitset of road indexes, as numbered in self.roads
+        :return: (distance, tile index) or (None, None) if no road of the mask is reachable
+        """
+        if self.rings is None:
+            self.build_rings()
+        if self.rings is None:
+            return self.nearest_bfs(u, mask)
+        for distance, ring in enumerate(self.rings[self.road_index[u]]):
+            hit = ring & mask
+            if hit:
+                return distance, self.roads[(hit & -hit).bit_length() - 1]
+        return None, None
+
+    def nearest_bfs(self, u, mask):
+        """
+        nearest() by a BFS in rings of equal distance, for mazes above table_limit
+        :param u: from
+        :param mask: bitset of road indexes, as numbered in self.roads
+        :return: (distance, tile index) or (None, None) if no road of the mask is reachable
+        """
+        if not mask:
+            return None, None
+        road_index = self.road_index
+        seen = {u}
+        frontier = [u]
+        distance = 0
+        while frontier:
+            hits = [v for v in frontier if mask >> road_index[v] & 1]
+            if hits:
+                # roads are numbered in tile order, the lowest tile has the lowest index
+                return distance, min(hits)
+            frontier = self.expand_frontier(frontier, seen)
+            distance += 1
+        return None, None
+
+    def BFS(self, start, target, exploration=False):
         """
         BFS implementation
+        Parent pointers and a deque, every node is queued once
+        The number of expanded nodes is stored in self.expanded
         :param start: starting point
         :param target: point with a prize
+        :param exploration: return every node in the order it was discovered instead of the path, for visualisation
         :return: list of path indexes that were lead from root to the target
         """
-        visited, queue, path = set(), collections.deque([start]), [start]
+        parent = {start: None}
+        order = [start]
+        queue = collections.deque([start])
+        self.expanded = 0
+
+        if start == target:
+            return order
 
-        visited.add(start)
         while queue:
             vertex = queue.popleft()
+            self.expanded += 1
             for neighbour in self.graph[vertex]:
-                if neighbour not in visited:
-                    visited.add(neighbour)
-                    queue.append(neighbour)
-                    if not is_acceptable(path[len(path) - 1], neighbour):
-                        add_back_road(path, neighbour)
-                    path.append(neighbour)
-                    # target reached
+                if neighbour not in parent:
+                    parent[neighbour] = vertex
+                    order.append(neighbour)
+                    # target reached, no shorter path can be discovered later
                     if neighbour == target:
-                        return path
+                        return order if exploration else trace_path(parent, neighbour)
+                    queue.append(neighbour)
 
         return None
 
-    def DFS(self, start, target):
+    def DFS(self, start, target, exploration=False):
         """
         DFS implementation
+        Parent pointers and a stack, neighbours are explored in the order of the adjacency list
+        The number of expanded nodes is stored in self.expanded
         :param start: starting point
         :param target: point with a prize
+        :param exploration: return every node in the order it was visited instead of the path, for visualisation
         :return: list of path indexes that were lead from root to the target
         """
-        path = []
-        q = [start]
-        while q:
-            v = q.pop(0)
-            if v not in path:
-                if len(path) > 1 and not is_acceptable(path[len(path) - 1], v):
-                    add_back_road(path, v)
-                path.append(v)
-                if v == target:
-                    return path
-                q = self.graph[v] + q
+        parent = {}
+        order = []
+        stack = [(start, None)]
+        self.expanded = 0
+
+        while stack:
+            v, before = stack.pop()
+            if v in parent:
+                continue
+            parent[v] = before
+            order.append(v)
+            if v == target:
+                return order if exploration else trace_path(parent, v)
+            self.expanded += 1
+            # reversed, so the first neighbour is popped first
+            for neighbour in reversed(self.graph[v]):
+                if neighbour not in parent:
+                    stack.append((neighbour, v))
+
         return None
 
     def UCS(self, start, target):
         """
         UCS implementation
+        Dijkstra on a binary heap with parent pointers, the path is rebuilt only once the target is settled
+        The number of expanded nodes is stored in self.expanded
         :param start: starting point
         :param target: point with a prize
-        :return: list of path indexes that were lead from root to the target and cost
+        :return: list of path indexes that were lead from root to the target
         """
-        # cost for each step is 1 as discussed on the practice lesson
-        default_cost = 1
-        queue = Q.PriorityQueue()
-        queue.put((0, [start]))
-        visited = set()
+        cost = {start: 0}
+        parent = {start: None}
+        settled = set()
+        queue = [(0, start)]
+        self.expanded = 0
+
+        while queue:
+            current_cost, current = heapq.heappop(queue)
 
-        while not queue.empty():
-            node = queue.get()
-            current = node[1][len(node[1]) - 1]
+            # stale entry, the node was already settled cheaper
+            if current in settled:
+                continue
+            settled.add(current)
+            self.expanded += 1
 
-            if target in node[1]:
-                return node[1]
+            if current == target:
+                path = []
+                while current is not None:
+                    path.append(current)
+                    current = parent[current]
+                return path[::-1]
 
-            cost = node[0]
             for neighbor in self.graph[current]:
-                if neighbor not in visited:
-                    visited.add(neighbor)
-                    temp = node[1][:]
-                    temp.append(neighbor)
-                    queue.put((cost + default_cost, temp))
+                new_cost = current_cost + self.edge_cost(current, neighbor)
+                if neighbor not in settled and new_cost < cost.get(neighbor, math.inf):
+                    cost[neighbor] = new_cost
+                    parent[neighbor] = current
+                    heapq.heappush(queue, (new_cost, neighbor))
 
         return None
 
-    def Greedy(self, start, end):
+    def Greedy(self, start, target, heuristic=None, budget=None):
         """
-        Greedy algorithm implementation
+        Greedy best-first search
+        Always expands the queued node closest to the target by the heuristic, ties broken by tile index
+        Nodes the heuristic rates math.inf are never queued, which keeps the search away from them
+        The number of expanded nodes is stored in self.expanded
         :param start: starting point
-        :param end: point with a prize
-        :return: list of path indexes that were lead from root to the target
+        :param target: point with a prize
+        :param heuristic: estimate function (u, v), self.manhattan when None
+        :param budget: maximum number of expanded nodes, None searches until the queue is empty
+        :return: list of path indexes that were lead from root to the target,
+        to the queued node closest to the target when the budget runs out, None when the target is unreachable
         """
-        path = []
-        visited = [end]
-        curr = end
-        prev = end
-        while curr != start:
-            next_opts = list(filter(lambda v: v not in visited, adj(curr)))
-            if not next_opts:
-                next_opts = list(filter(lambda v: v != prev, adj(curr)))
-            closest = random.choice(next_opts)
-            path.append(closest)
-            visited.append(closest)
-            prev = curr
-            curr = closest
+        heuristic = heuristic or self.manhattan
+        visited = bytearray(len(self.tiles))
+        visited[start] = 1
+        parent = {start: None}
+        best = (heuristic(start, target), start)
+        queue = [best]
+        self.expanded = 0
 
-        path.reverse()
-        return path
+        while queue:
+            _, current = heapq.heappop(queue)
+            if current == target:
+                return trace_path(parent, current)
+            if budget is not None and self.expanded >= budget:
+                return trace_path(parent, best[1])
+            self.expanded += 1
+
+            for neighbor in self.graph[current]:
+                if visited[neighbor]:
+                    continue
+                visited[neighbor] = 1
+                estimate = heuristic(neighbor, target)
+                if estimate == math.inf:
+                    continue
+                parent[neighbor] = current
+                heapq.heappush(queue, (estimate, neighbor))
+                best = min(best, (estimate, neighbor))
 
-    def AStar(self, start, end):
+        return None
+
+    def manhattan(self, u, v):
+        """
+        Manhattan distance between two tiles over their (row, col) split
+        :param u: from
+        :param v: to
+        :return: admissible estimate of steps from u to v
+        """
+        u_row, u_col = divmod(u, self.width)
+        v_row, v_col = divmod(v, self.width)
+        return abs(u_row - v_row) + abs(u_col - v_col)
+
+    def AStar(self, start, end, heuristic=None):
         """
         A* implementation
+        Binary heap with lazy deletion, g-scores and parents kept in dicts
+        The number of expanded nodes is stored in self.expanded
         :param start: starting point
         :param end: point with a prize
+        :param heuristic: admissible function (node, end) -> estimate, Manhattan distance by default
         :return: list of path indexes that were lead from root to the target
         """
+        if heuristic is None:
+            heuristic = self.manhattan
 
-        class Node():
-            """A node class for A* Pathfinding"""
+        g_score = {start: 0}
+        parent = {start: None}
+        closed = set()
+        # (f, -g, node); the g breaks ties toward deeper nodes
+        open_heap = [(heuristic(start, end), 0, start)]
+        self.expanded = 0
 
-            def __init__(self, parent=None, position=None):
-                self.parent = parent
-                self.position = position
+        while open_heap:
+            _, _, current = heapq.heappop(open_heap)
 
-                self.g = 0
-                self.h = 0
-                self.f = 0
-
-            def __eq__(self, other):
-                return self.position == other.position
+            # stale entry, the node was already reached cheaper
+            if current in closed:
+                continue
+            closed.add(current)
+            self.expanded += 1
 
-        # Create start and end node
-        # start = get_2d_index(self.tiles, start)
-        start_node = Node(None, start)
-        start_node.g = start_node.h = start_node.f = 0
-        # end = get_2d_index(self.tiles, end)
-        end_node = Node(None, end)
-        end_node.g = end_node.h = end_node.f = 0
+            # Found the goal
+            if current == end:
+                path = []
+                while current is not None:
+                    path.append(current)
+                    current = parent[current]
+                return path[::-1]  # Return reversed path
 
-        # Initialize both open and closed list
+            for neighbour in self.graph[current]:
+                g = g_score[current] + self.edge_cost(current, neighbour)
+                if neighbour in closed or g >= g_score.get(neighbour, math.inf):
+                    continue
+                g_score[neighbour] = g
+                parent[neighbour] = current
+                heapq.heappush(open_heap, (g + heuristic(neighbour, end), -g, neighbour))
 
-        open_list = []
-        closed_list = []
+        return None
 
-        # Add the start node
-        open_list.append(start_node)
+    def is_open(self, x, y):
+        """
+        :param x: column
+        :param y: row
+        :return: True if the tile is inside the maze and not a wall
+        """
+        return 0 <= x < self.width and 0 <= y and y * self.width + x < len(self.tiles) \
+            and self.tiles[y * self.width + x] != 0
 
-        # Loop until you find the end
-        while len(open_list) > 0:
+    def jump(self, x, y, dx, dy, goal):
+        """
+        Jump along a straight line until something forces a turn
+        Horizontal jumps stop where a side tile opens behind a wall, vertical jumps stop
+        wherever a horizontal jump from them would stop
+        :param x: column to jump from
+        :param y: row to jump from
+        :param dx: column step
+        :param dy: row step
+        :param goal: (x, y) of the target
+        :return: (x, y) of the jump point or None
+        """
+        while True:
+            x += dx
+            y += dy
+            if not self.is_open(x, y):
+                return None
+            if (x, y) == goal:
+                return x, y
+            if dx:
+                if (self.is_open(x, y - 1) and not self.is_open(x - dx, y - 1)) or \
+                        (self.is_open(x, y + 1) and not self.is_open(x - dx, y + 1)):
+                    return x, y
+            elif self.jump(x, y, 1, 0, goal) or self.jump(x, y, -1, 0, goal):
+                return x, y
+
+    def JPS(self, start, target):
+        """
+        Jump Point Search for a 4-connected grid where every step costs 1
+        Only jump points are pushed on the heap, straight runs between them are scanned without it
+        The number of expanded jump points is stored in self.expanded
+        :param start: starting point
+        :param target: point with a prize
+        :return: list of path indexes that were lead from root to the target
+        """
+        width = self.width
+        goal = (target % width, target // width)
+        origin = (start % width, start // width)
+        g_score = {origin: 0}
+        parent = {origin: None}
+        closed = set()
+        open_heap = [(0, 0, origin, (0, 0))]
+        self.expanded = 0
+
+        while open_heap:
+            _, _, node, (dx, dy) = heapq.heappop(open_heap)
+            if node in closed:
+                continue
+            closed.add(node)
+            self.expanded += 1
 
-            # Get the current node
-            current_node = open_list[0]
-            current_index = 0
-            for index, item in enumerate(open_list):
-                if item.f < current_node.f:
-                    current_node = item
-                    current_index = index
+            if node == goal:
+                path = []
+                while node is not None:
+                    before = parent[node]
+                    if before is not None:
+                        # every straight run between jump points, without its first tile
+                        step_x = (node[0] > before[0]) - (node[0] < before[0])
+                        step_y = (node[1] > before[1]) - (node[1] < before[1])
+                        x, y = node
+                        while (x, y) != before:
+                            path.append(y * width + x)
+                            x, y = x - step_x, y - step_y
+                    else:
+                        path.append(node[1] * width + node[0])
+                    node = before
+                return path[::-1]
+
+            x, y = node
+            if (dx, dy) == (0, 0):
+                directions = [(1, 0), (-1, 0), (0, 1), (0, -1)]
+            elif dx:
+                # horizontal: go on, turn only where the side tile opens behind a wall
+                directions = [(dx, 0)] + [(0, side) for side in (-1, 1)
+                                          if self.is_open(x, y + side) and not self.is_open(x - dx, y + side)]
+            else:
+                # vertical: go on or turn to either side
+                directions = [(0, dy), (1, 0), (-1, 0)]
+
+            for (step_x, step_y) in directions:
+                point = self.jump(x, y, step_x, step_y, goal)
+                if point is None or point in closed:
+                    continue
+                g = g_score[node] + abs(point[0] - x) + abs(point[1] - y)
+                if g >= g_score.get(point, math.inf):
+                    continue
+                g_score[point] = g
+                parent[point] = node
+                h = abs(point[0] - goal[0]) + abs(point[1] - goal[1])
+                heapq.heappush(open_heap, (g + h, -g, point, (step_x, step_y)))
 
-                # Pop current off open list, add to closed list
-            open_list.pop(current_index)
-            closed_list.append(current_node)
+        return None
 
-            # Found the goal
-            if current_node == end_node:
+    def BiBFS(self, start, target):
+        """
+        Bidirectional BFS, the smaller frontier grows a whole level at a time until the two meet
+        The number of expanded nodes is stored in self.expanded
+        :param start: starting point
+        :param target: point with a prize
+        :return: list of path indexes that were lead from root to the target
+        """
+        if start == target:
+            self.expanded = 0
+            return [start]
+
+        # parents toward the start and toward the target
+        forward, backward = {start: None}, {target: None}
+        forward_level, backward_level = [start], [target]
+        self.expanded = 0
+
+        while forward_level and backward_level:
+            grow_forward = len(forward_level) <= len(backward_level)
+            level, parents, other = (forward_level, forward, backward) if grow_forward \
+                else (backward_level, backward, forward)
+
+            # finish the whole level, the first meeting found is not always the shortest
+            meet, best, next_level = None, math.inf, []
+            for u in level:
+                self.expanded += 1
+                for v in self.graph[u]:
+                    if v not in parents:
+                        parents[v] = u
+                        next_level.append(v)
+                    if v in other and parents.get(v) == u:
+                        length = self.depth(other, v)
+                        if length < best:
+                            meet, best = v, length
+
+            if meet is not None:
                 path = []
-                current = current_node
-                while current is not None:
-                    path.append(current.position)
-                    current = current.parent
-                return path[::-1]  # Return reversed path
+                node = meet
+                while node is not None:
+                    path.append(node)
+                    node = forward[node]
+                path.reverse()
+                node = backward[meet]
+                while node is not None:
+                    path.append(node)
+                    node = backward[node]
+                return path
+
+            if grow_forward:
+                forward_level = next_level
+            else:
+                backward_level = next_level
 
-            # Generate children
-            children = []
-            for new_position in [-1, 1, -self.offset, self.offset]:#, (-1, -1), (-1, 1), (1, -1), (1, 1)]:  # Adjacent squares
+        return None
 
-                # Get node position
-                node_position = current_node.position + new_position
+    @staticmethod
+    def depth(parents, node):
+        """
+        :param parents: parent pointers of a search
+        :param node: node of that search
+        :return: number of steps from the root of the search to the node
+        """
+        depth = 0
+        while parents[node] is not None:
+            node = parents[node]
+            depth += 1
+        return depth
 
-                # Make sure within range
-                if node_position > (len(self.tiles) - 1) or node_position < 0:
-                    continue
+    def BiAStar(self, start, target, heuristic=None):
+        """
+        Bidirectional A*, both searches grow from the side with the smaller f until
+        one side cannot beat the best meeting point found so far
+        The number of expanded nodes is stored in self.expanded
+        :param start: starting point
+        :param target: point with a prize
+        :param heuristic: admissible function (node, end) -> estimate, Manhattan distance by default
+        :return: list of path indexes that were lead from root to the target
+        """
+        if heuristic is None:
+            heuristic = self.manhattan
+        if start == target:
+            self.expanded = 0
+            return [start]
+
+        # g-scores and parents toward the start (forward) and toward the target (backward)
+        g_scores = ({start: 0}, {target: 0})
+        parents = ({start: None}, {target: None})
+        ends = (target, start)
+        heaps = ([(heuristic(start, target), start)], [(heuristic(target, start), target)])
+        closed = (set(), set())
+        best, meet = math.inf, None
+        self.expanded = 0
+
+        while heaps[0] and heaps[1]:
+            if min(heaps[0][0][0], heaps[1][0][0]) >= best:
+                break
+            side = 0 if heaps[0][0][0] <= heaps[1][0][0] else 1
+            g_score, parent, end = g_scores[side], parents[side], ends[side]
+
+            _, u = heapq.heappop(heaps[side])
+            if u in closed[side]:
+                continue
+            closed[side].add(u)
+            self.expanded += 1
+
+            for v in self.graph[u]:
+                # the maze graph is symmetric, the backward search walks the same edges reversed
+                g = g_score[u] + (self.edge_cost(u, v) if side == 0 else self.edge_cost(v, u))
+                if g < g_score.get(v, math.inf):
+                    g_score[v] = g
+                    parent[v] = u
+                    heapq.heappush(heaps[side], (g + heuristic(v, end), v))
+                if v in g_scores[1 - side] and g_score[v] + g_scores[1 - side][v] < best:
+                    best, meet = g_score[v] + g_scores[1 - side][v], v
+
+        if meet is None:
+            return None
 
-                # Make sure walkable terrain
-                if self.tiles[node_position] == 0:
-                    continue
+        path = []
+        node = meet
+        while node is not None:
+            path.append(node)
+            node = parents[0][node]
+        path.reverse()
+        node = parents[1][meet]
+        while node is not None:
+            path.append(node)
+            node = parents[1][node]
+        return path
 
-                # Create new node
-                new_node = Node(current_node, node_position)
 
-                if new_node in closed_list:
-                    continue
+class FlowField:
+    """
+    Distances and next hops of every tile toward one target, shared by all the agents chasing it
+    The BFS from the target is expanded lazily, only as far as the tiles that were asked for,
+    and starts over without clearing its buffers when the target moves
+    """
+
+    def __init__(self, graph):
+        """
+        :param graph: Graph to walk
+        """
+        size = len(graph.tiles)
+        self.graph = graph.graph
+        self.dist = array('l', [0]) * size
+        self.next = array('l', [0]) * size
+        # generation in which dist and next of a tile were set, older values are stale
+        self.stamp = array('L', [0]) * size
+        self.generation = 0
+        self.target = None
+        self.queue = collections.deque()
+        # number of tiles expanded since the field was created
+        self.expanded = 0
+
+    def update(self, target):
+        """
+        Point the field at a new target, nothing is done if it did not move
+        :param target: tile the agents head for
+        """
+        if target == self.target:
+            return
+        self.generation += 1
+        self.target = target
+        self.queue.clear()
+        self.queue.append(target)
+        self.stamp[target] = self.generation
+        self.dist[target] = 0
+        self.next[target] = target
+
+    def settle(self, v):
+        """
+        Expand the BFS until the tile is reached
+        :param v: tile index
+        :return: False if the tile cannot reach the target
+        """
+        stamp, generation, queue = self.stamp, self.generation, self.queue
+        while stamp[v] != generation and queue:
+            u = queue.popleft()
+            self.expanded += 1
+            dist = self.dist[u] + 1
+            for w in self.graph[u]:
+                if stamp[w] != generation:
+                    stamp[w] = generation
+                    self.dist[w] = dist
+                    self.next[w] = u
+                    queue.append(w)
+        return stamp[v] == generation
+
+    def next_step(self, v):
+        """
+        :param v: tile index
+        :return: next tile from v toward the target (the target itself once there), None if unreachable
+        """
+        return self.next[v] if self.settle(v) else None
 
-                # Append
-                children.append(new_node)
+    def distance(self, v):
+        """
+        :param v: tile index
+        :return: number of steps from v to the target, None if unreachable
+        """
+        return self.dist[v] if self.settle(v) else None
 
-            # Loop through children
-            for child in children:
 
-                # Child is on the closed list
-                for closed_child in closed_list:
-                    if child == closed_child:
-                        continue
+class DStarLite:
+    """
+    Incremental shortest path planner (D* Lite) that keeps its search state between calls
+    The search runs backward from the goal, so a moved start only shifts the key offset and a changed
+    tile only requeues its neighbours; only the affected part of the search is repaired.
+    A moved goal is the root of every g value. It can be repaired as in Basic Moving Target D* Lite: the new goal
+    becomes the root and the old one an ordinary node, and the g values that hung on it are raised and lowered
+    again up to the start's key. Every g value changes when the root moves, so on the mazes benchmarked that
+    repair expands more nodes than planning from scratch, which stays the default
+    """
 
-                # Create the f, g, and h values
-                child.g = current_node.g + 1
-                child.h = (child.position - end_node.position) ** 2
-                child.f = child.g + child.h
+    def __init__(self, graph, start, goal, repair_goal=False):
+        """
+        :param graph: Graph to plan on, edge costs are read with graph.edge_cost
+        :param start: starting point
+        :param goal: target point
+        :param repair_goal: repair the search for a moved goal with move_goal instead of starting over
+        """
+        self.graph = graph
+        self.repair_goal = repair_goal
+        # number of nodes expanded since the planner was created
+        self.expanded = 0
+        self.reset(start, goal)
 
-                # Child is already in the open list
-                for open_node in open_list:
-                    if child == open_node and child.g > open_node.g:
-                        continue
+    def reset(self, start, goal):
+        """
+        Drop the search state and plan from scratch
+        :param start: starting point
+        :param goal: target point
+        """
+        self.start = start
+        self.last = start
+        self.goal = goal
+        self.km = 0
+        self.g = {}
+        self.rhs = {goal: 0}
+        # keys of the nodes in the queue, heap entries that disagree with it are stale
+        self.queued = {}
+        self.queue = []
+        self.push(goal)
+
+    def key(self, u):
+        best = min(self.g.get(u, math.inf), self.rhs.get(u, math.inf))
+        return best + self.graph.manhattan(self.start, u) + self.km, best
+
+    def push(self, u):
+        key = self.key(u)
+        self.queued[u] = key
+        heapq.heappush(self.queue, (key, u))
+
+    def update_vertex(self, u):
+        if u != self.goal:
+            self.rhs[u] = min((self.graph.edge_cost(u, v) + self.g.get(v, math.inf) for v in self.graph.graph[u]),
+                              default=math.inf)
+        self.queued.pop(u, None)
+        if self.g.get(u, math.inf) != self.rhs.get(u, math.inf):
+            self.push(u)
+
+    def compute_shortest_path(self):
+        queue, queued = self.queue, self.queued
+        while queue:
+            key, u = queue[0]
+            # stale entry, the node was requeued with another key or left the queue
+            if queued.get(u) != key:
+                heapq.heappop(queue)
+                continue
+            if key >= self.key(self.start) and self.rhs.get(self.start, math.inf) == self.g.get(self.start, math.inf):
+                break
+
+            heapq.heappop(queue)
+            del queued[u]
+            self.expanded += 1
+            if key < self.key(u):
+                self.push(u)
+            elif self.g.get(u, math.inf) > self.rhs[u]:
+                self.g[u] = self.rhs[u]
+                # the maze graph is symmetric, predecessors are the neighbours
+                for v in self.graph.graph[u]:
+                    self.update_vertex(v)
+            else:
+                self.g[u] = math.inf
+                for v in self.graph.graph[u]:
+                    self.update_vertex(v)
+                self.update_vertex(u)
+
+    def set_cost(self, u, v, cost):
+        """
+        Change the cost of the step from u to v and repair the search
+        :param u: from
+        :param v: to
+        :param cost: new cost, math.inf to block it
+        """
+        if cost == 1:
+            self.graph.costs.pop((u, v), None)
+        else:
+            self.graph.costs[(u, v)] = cost
+        self.update_vertex(u)
 
-                # Add the child to the open list
-                open_list.append(child)
+    def block(self, tile, blocked=True):
+        """
+        Close a tile (a wall appeared) or open it again
+        :param tile: tile index
+        :param blocked: True to close the tile, False to open it
+        """
+        cost = math.inf if blocked else 1
+        for v in self.graph.graph[tile]:
+            self.set_cost(tile, v, cost)
+            self.set_cost(v, tile, cost)
+
+    def move_goal(self, new_goal):
+        """
+        Make new_goal the root of the search, keeping every g value for the repair to start from
+        :param new_goal: target point
+        """
+        old_goal = self.goal
+        self.goal = new_goal
+        self.rhs[new_goal] = 0
+        self.update_vertex(new_goal)
+        # the old goal now takes its rhs from its neighbours like any other node
+        self.update_vertex(old_goal)
+
+    def replan(self, new_start, new_goal):
+        """
+        Repair the search for a moved start or goal and return the new path
+        :param new_start: starting point
+        :param new_goal: target point
+        :return: list of path indexes that were lead from root to the target, None if unreachable
+        """
+        if new_goal != self.goal and not self.repair_goal:
+            self.reset(new_start, new_goal)
+        elif new_start != self.start:
+            self.start = new_start
+            self.km += self.graph.manhattan(self.last, new_start)
+            self.last = new_start
+        if new_goal != self.goal:
+            self.move_goal(new_goal)
+
+        self.compute_shortest_path()
+
+        if self.g.get(self.start, math.inf) == math.inf:
+            return None
+        path = [self.start]
+        current = self.start
+        while current != self.goal:
+            current = min((self.graph.edge_cost(current, v) + self.g.get(v, math.inf), v)
+                          for v in self.graph.graph[current])[1]
+            path.append(current)
+        return path
+
+
+class ContractedGraph:
+    """
+    Maze graph with the corridors contracted away
+    Only junctions and dead ends are nodes, every edge is a corridor weighted by its length
+    that remembers the tiles along it, so searches expand far fewer nodes and paths are
+    expanded back to tiles only at the end
+    """
+
+    def __init__(self, graph):
+        """
+        :param graph: tile Graph to contract
+        """
+        adj = graph.graph
+        tiles = [u for u in list(adj) if adj[u]]
+        nodes = {u for u in tiles if len(adj[u]) != 2}
+
+        # corridor walked from node u through its neighbour first: tiles after u up to the node it ends at
+        self.corridors = {}
+        # (corridor key, index in it) of every corridor tile
+        self.position = {}
+        # shortest corridor between two nodes
+        self.best = {}
+
+        for u in list(nodes):
+            for first in adj[u]:
+                self.walk(adj, nodes, u, first)
+        # a loop without any junction gets one of its tiles as a node
+        for u in tiles:
+            if u not in nodes and u not in self.position:
+                nodes.add(u)
+                for first in adj[u]:
+                    self.walk(adj, nodes, u, first)
+
+        self.nodes = nodes
+        self.expanded = 0
+        self.graph = Graph(graph.tiles, graph.width,
+                           adjacency=((u, [v for (x, v) in self.best if x == u]) for u in nodes))
+        for ((u, v), key) in self.best.items():
+            self.graph.costs[(u, v)] = len(self.corridors[key])
+
+    def walk(self, adj, nodes, u, first):
+        """
+        Follow a corridor from node u until the next node
+        :param adj: tile adjacency
+        :param nodes: junctions and dead ends
+        :param u: node the corridor starts at
+        :param first: first tile of the corridor
+        """
+        key = (u, first)
+        corridor = [first]
+        prev, current = u, first
+        while current not in nodes:
+            prev, current = current, adj[current][0] if adj[current][0] != prev else adj[current][1]
+            corridor.append(current)
+
+        self.corridors[key] = corridor
+        for (i, tile) in enumerate(corridor[:-1]):
+            self.position.setdefault(tile, (key, i))
+
+        v = corridor[-1]
+        if u != v and ((u, v) not in self.best or len(corridor) < len(self.corridors[self.best[(u, v)]])):
+            self.best[(u, v)] = key
+
+    def ends(self, tile):
+        """
+        Nodes a corridor tile is connected to
+        :param tile: corridor tile index
+        :return: list of (node, steps to it, tiles after the tile up to the node)
+        """
+        key, i = self.position[tile]
+        corridor = self.corridors[key]
+        u = key[0]
+        return [(u, i + 1, corridor[i - 1::-1] + [u] if i else [u]),
+                (corridor[-1], len(corridor) - 1 - i, corridor[i + 1:])]
+
+    def path(self, start, target, method='UCS'):
+        """
+        Search the contracted graph and expand the result to tiles
+        Corridor tiles at either end are linked to their corridor's nodes for the search only
+        :param start: starting point
+        :param target: point with a prize
+        :param method: Graph search to run, UCS or AStar for shortest paths
+        :return: list of path indexes that were lead from root to the target, None if unreachable
+        """
+        if start == target:
+            return [start]
+        # a tile without any edge is neither a node nor on a corridor
+        if not (start in self.nodes or start in self.position) or not (target in self.nodes or target in self.position):
+            self.expanded = 0
+            return None
+
+        graph, costs = self.graph.graph, self.graph.costs
+        # tiles of every edge that is not a whole corridor between two nodes
+        segments = {}
+
+        def link(u, v, tiles):
+            if (u, v) not in segments or len(tiles) < len(segments[(u, v)]):
+                segments[(u, v)] = tiles
+
+        if start not in self.nodes:
+            for (node, _, tiles) in self.ends(start):
+                link(start, node, tiles)
+        if target not in self.nodes:
+            for (node, _, tiles) in self.ends(target):
+                # walking toward the target is the walk from the target, reversed
+                link(node, target, tiles[-2::-1] + [target])
+            if start not in self.nodes and self.position[start][0] == self.position[target][0]:
+                key, i = self.position[start]
+                j = self.position[target][1]
+                corridor = self.corridors[key]
+                link(start, target, corridor[i + 1:j + 1] if j > i else corridor[j:i][::-1])
+
+        for ((u, v), tiles) in segments.items():
+            graph[u].append(v)
+            costs[(u, v)] = len(tiles)
+        try:
+            nodes = getattr(self.graph, method)(start, target)
+        finally:
+            for (u, v) in segments:
+                graph[u].remove(v)
+                del costs[(u, v)]
+        self.expanded = self.graph.expanded
+        if nodes is None:
+            return None
+
+        path = [start]
+        for (u, v) in zip(nodes, nodes[1:]):
+            if (u, v) in segments:
+                path += segments[(u, v)]
+            else:
+                path += self.corridors[self.best[(u, v)]]
+        return path
 
 
 tiles = [
@@ -323,17 +1242,26 @@ def get_roads(tiles):
     return [i for (i, tile) in enumerate(tiles) if tile == 1]
 
 
-def adj(v):
-    adj = []
-    if tiles[v + 1] == 1:
-        adj.append(v + 1)
-    if tiles[v - 1] == 1:
-        adj.append(v - 1)
-    if tiles[v + 20] == 1:
-        adj.append(v + 20)
-    if tiles[v - 20] == 1:
-        adj.append(v - 20)
-    return adj
+def adj(v, maze=None, width=20):
+    """
+    get the road tiles next to a tile
+    :param v: tile index
+    :param maze: list of tiles, the built-in maze when None
+    :param width: row length
+    :return: list of neighbouring indexes with a coin
+    """
+    maze = tiles if maze is None else maze
+    column = v % width
+    neighbours = []
+    if column != width - 1 and maze[v + 1] == 1:
+        neighbours.append(v + 1)
+    if column != 0 and maze[v - 1] == 1:
+        neighbours.append(v - 1)
+    if v < len(maze) - width and maze[v + width] == 1:
+        neighbours.append(v + width)
+    if v >= width and maze[v - width] == 1:
+        neighbours.append(v - width)
+    return neighbours
 
 
 def print_path(path):
@@ -376,7 +1304,7 @@ if __name__ == '__main__':
     path = g.Greedy(starting_point, prize)
 
     print(
-        f"Greedy path({len(path)} steps) from starting point {starting_point} to target point {prize}:")
+        f"Greedy path({len(path)} steps, {g.expanded} expanded) from starting point {starting_point} to target point {prize}:")
     print_path(path)
 
     print("----")
@@ -384,5 +1312,5 @@ if __name__ == '__main__':
     path = g.AStar(starting_point, prize)
 
     print(
-        f"A* path({len(path)} steps) from starting point {starting_point} to target point {prize}:")
+        f"A* path({len(path)} steps, {g.expanded} expanded) from starting point {starting_point} to target point {prize}:")
     print_path(path)
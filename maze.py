@@ -0,0 +1,177 @@
+import random
+from array import array
+
+import graph
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, the array module is used without it
+    np = None
+
+
+class Maze:
+    """
+    Maze backed by a flat uint8 grid with the neighbours of every tile in CSR layout
+    The neighbours of tile i are indices[indptr[i]:indptr[i + 1]], in the same order as Graph builds them
+    Bulk operations are vectorized with NumPy when it is installed
+    """
+
+    def __init__(self, tiles, width=20):
+        """
+        :param tiles: 1d array with tiles, 0 is a wall
+        :param width: row length
+        """
+        self.width = width
+        self.height = len(tiles) // width
+        if np is not None:
+            self.grid = np.asarray(tiles, dtype=np.uint8)
+            self.indptr, self.indices = self._build_neighbours_numpy()
+        else:
+            self.grid = array('B', tiles)
+            self.indptr, self.indices = self._build_neighbours()
+
+    def _build_neighbours_numpy(self):
+        width, size = self.width, len(self.grid)
+        index = np.arange(size)
+        col = index % width
+        is_open = self.grid != 0
+
+        # left, right, top, bottom; only coin tiles get edges, as in Graph
+        targets = np.stack([index - 1, index + 1, index - width, index + width], axis=1)
+        valid = np.stack([col > 0, col < width - 1, index >= width, index < size - width], axis=1)
+        valid &= (self.grid == 1)[:, None]
+        valid &= is_open[np.where(valid, targets, 0)]
+
+        indptr = np.zeros(size + 1, dtype=np.int64)
+        np.cumsum(valid.sum(axis=1), out=indptr[1:])
+        return indptr, targets[valid]
+
+    def _build_neighbours(self):
+        width, size, grid = self.width, len(self.grid), self.grid
+        indptr = array('q', [0])
+        indices = array('q')
+
+        for i in range(size):
+            if grid[i] == 1:
+                col = i % width
+                for (j, inside) in ((i - 1, col > 0), (i + 1, col < width - 1),
+                                    (i - width, i >= width), (i + width, i < size - width)):
+                    if inside and grid[j] != 0:
+                        indices.append(j)
+            indptr.append(len(indices))
+
+        return indptr, indices
+
+    def neighbours(self, i):
+        """
+        :param i: tile index
+        :return: neighbour tile indexes
+        """
+        return self.indices[self.indptr[i]:self.indptr[i + 1]]
+
+    def wall_mask(self):
+        """
+        :return: True for every wall tile
+        """
+        if np is not None:
+            return self.grid == 0
+        return [tile == 0 for tile in self.grid]
+
+    def get_roads(self):
+        """
+        get only roads, as graph.get_roads
+        :return: indexes of the tiles with a coin
+        """
+        if np is not None:
+            return np.flatnonzero(self.grid == 1)
+        return array('q', (i for (i, tile) in enumerate(self.grid) if tile == 1))
+
+    def count_coins(self):
+        """
+        :return: number of tiles with a coin
+        """
+        if np is not None:
+            return int(np.count_nonzero(self.grid == 1))
+        return self.grid.count(1)
+
+    def tolist(self):
+        """
+        :return: tiles as the plain list the rest of the code uses
+        """
+        return [int(tile) for tile in self.grid]
+
+    def to_graph(self):
+        """
+        Build a Graph from the precomputed neighbours instead of scanning the tiles again
+        :return: graph.Graph
+        """
+        indptr, indices = self.indptr, self.indices
+        adjacency = ((int(i), [int(v) for v in indices[indptr[i]:indptr[i + 1]]])
+                     for i in self.get_roads())
+        return graph.Graph(self.tolist(), self.width, adjacency)
+
+
+def generate(width, height, seed=0, loops=0.1):
+    """
+    Seeded Pacman-style maze of any size
+    A recursive backtracker carves corridors between the cells on odd rows and columns, then a share of the walls
+    between two corridors is knocked out so the maze has loops to get away from the ghosts through
+    The backtracker keeps its own stack, so mazes of a million tiles do not hit the recursion limit
+    :param width: row length, at least 3
+    :param height: number of rows, at least 3
+    :param seed: random seed, the same seed gives the same maze
+    :param loops: share of the walls between two corridors to remove, 0 leaves a perfect maze without loops
+    :return: list of tiles as graph.tiles uses them, 0 is a wall and 1 a road with a coin
+    """
+    columns, rows = (width - 1) // 2, (height - 1) // 2
+    if columns < 1 or rows < 1:
+        raise ValueError(f"a {width}x{height} maze has no room for a corridor")
+
+    rng = random.Random(seed)
+    grid = bytearray(width * height)
+    # cell (row, column) is the tile (2 * row + 1, 2 * column + 1), the walls around it are the tiles in between
+    start = width + 1
+    grid[start] = 1
+    stack = [(start, 0, 0)]
+    while stack:
+        tile, row, column = stack[-1]
+        moves = []
+        if column > 0 and not grid[tile - 2]:
+            moves.append((tile - 2, row, column - 1))
+        if column < columns - 1 and not grid[tile + 2]:
+            moves.append((tile + 2, row, column + 1))
+        if row > 0 and not grid[tile - 2 * width]:
+            moves.append((tile - 2 * width, row - 1, column))
+        if row < rows - 1 and not grid[tile + 2 * width]:
+            moves.append((tile + 2 * width, row + 1, column))
+        if not moves:
+            stack.pop()
+            continue
+        move = rng.choice(moves)
+        grid[(tile + move[0]) // 2] = 1
+        grid[move[0]] = 1
+        stack.append(move)
+
+    if loops:
+        # inner walls with a corridor on both sides, left and right or above and below
+        for y in range(1, 2 * rows):
+            for x in range(1 + y % 2, 2 * columns, 2):
+                i = y * width + x
+                if not grid[i] and rng.random() < loops:
+                    grid[i] = 1
+
+    return list(grid)
+
+
+def random_grid(width, height, walls=0.25, seed=0):
+    """
+    Open grid with randomly scattered walls and a wall border
+    :param width: row length
+    :param height: number of rows
+    :param walls: share of wall tiles inside the border
+    :param seed: random seed
+    :return: tiles
+    """
+    rng = random.Random(seed)
+    return [0 if x in (0, width - 1) or y in (0, height - 1) or rng.random() < walls else 1
+            for y in range(height) for x in range(width)]
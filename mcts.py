@@ -0,0 +1,390 @@
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import graph
+from minimax import CoinBits, GameState
+from transposition import Zobrist
+
+# rollout rewards from Pacman's point of view, a rollout cut off alive scores between them
+WIN = 1.0
+LOSS = 0.0
+
+
+class Node:
+    """
+    Position in the search tree, the agent to move chooses among its children
+    Value is the sum of the rollout rewards through the node, from Pacman's point of view
+    """
+    __slots__ = ('key', 'agent', 'children', 'untried', 'visits', 'value', 'terminal')
+
+    def __init__(self, key, agent, moves, terminal=None):
+        """
+        :param key: (pacman, ghosts, coins, agent)
+        :param agent: agent to move
+        :param moves: moves of the agent, expanded one by one
+        :param terminal: reward of a finished game, None while it goes on
+        """
+        self.key = key
+        self.agent = agent
+        self.children = {}
+        self.untried = [] if terminal is not None else list(moves)
+        self.visits = 0
+        self.value = 0.0
+        self.terminal = terminal
+
+
+class MCTS:
+    """
+    Monte Carlo Tree Search (UCT) agent with the find_best_move interface of Minimax
+    Rollouts follow the next-hop table: Pacman heads for the closest coin and keeps off the ghosts,
+    the ghosts chase Pacman, both with a little randomness
+    The tree is kept between calls and the subtree of the new position is searched further
+    """
+
+    def __init__(self, tiles, iterations=2000, rollout_depth=40, exploration=1.4, epsilon=0.1, seed=0, workers=1,
+                 width=20, table_limit=graph.TABLE_LIMIT):
+        """
+        :param tiles: maze
+        :param iterations: rollouts per move when find_best_move gets no time budget
+        :param rollout_depth: plies a rollout is played before it is scored
+        :param exploration: UCT exploration constant
+        :param epsilon: chance of a random move in a rollout
+        :param seed: random seed
+        :param workers: processes growing independent trees from the same root, 1 searches in this process
+        :param width: row length of the maze
+        :param table_limit: roads above which distances come from cached BFS fields instead of all-pairs tables
+        """
+        self.tiles = tiles
+        self.width = width
+        # roads of the maze whether their coin was eaten or not, the game keeps changing tiles
+        self.layout = bytes(1 if tile else 0 for tile in tiles)
+        self.g = graph.Graph(list(self.layout), width)
+        self.g.table_limit = table_limit
+        self.g.build_rings()
+        self.coin_bit = CoinBits(self.g.road_index)
+        # the states carry the coin keys of Minimax, so both agents can play on one state
+        self.coin_key = Zobrist(self.g.roads).coin
+        self.iterations = iterations
+        self.rollout_depth = rollout_depth
+        self.exploration = exploration
+        self.epsilon = epsilon
+        self.rng = random.Random(seed)
+        self.seed = seed
+
+        self.root = None
+
+        # statistics of the last find_best_move call
+        self.rollouts = 0
+        self.reused = 0
+        self.elapsed = 0.0
+
+        # root-parallel search processes, started by the first parallel search
+        self.workers = workers
+        self.pool = None
+
+    def new_state(self, tiles):
+        """
+        Create the game state for the maze, numbered the same way as the distance tables
+        :param tiles: maze
+        :return: GameState
+        """
+        return GameState(tiles, self.coin_bit, self.coin_key)
+
+    def reset(self):
+        """
+        Drop the tree of earlier games
+        """
+        self.root = None
+
+    def rollouts_per_second(self):
+        """
+        :return: rollouts per second of the last find_best_move call
+        """
+        return self.rollouts / self.elapsed if self.elapsed else 0.0
+
+    def play(self, state, pacman, ghosts, agent, move):
+        """
+        Make a move on the state
+        :param state: game state, eaten coins are made on it
+        :param pacman: pacman position
+        :param ghosts: tuple of ghosts positions
+        :param agent: agent to move
+        :param move: tile the agent moves to
+        :return: (pacman, ghosts, reward), reward is None while the game goes on
+        """
+        if agent == 0:
+            state.eat(move)
+            if move in ghosts:
+                return move, ghosts, LOSS
+            return move, ghosts, WIN if not state.count else None
+        ghosts = ghosts[:agent - 1] + (move,) + ghosts[agent:]
+        return pacman, ghosts, LOSS if move == pacman else None
+
+    def node(self, state, pacman, ghosts, agent, terminal=None):
+        """
+        :return: new tree node of the position
+        """
+        position = pacman if agent == 0 else ghosts[agent - 1]
+        moves = self.g.graph[position][:]
+        self.rng.shuffle(moves)
+        return Node((pacman, ghosts, state.coins, agent), agent, moves, terminal)
+
+    def rollout_move(self, state, pacman, ghosts, agent):
+        """
+        Cheap playout policy from the next-hop table
+        :return: tile the agent moves to
+        """
+        position = pacman if agent == 0 else ghosts[agent - 1]
+        moves = self.g.graph[position]
+        if self.rng.random() < self.epsilon:
+            return self.rng.choice(moves)
+        if agent:
+            # without the tables a chase across the maze walks a new field every ply,
+            # a ghost that cannot reach Pacman within the rollout moves at random instead
+            if self.g.dist_table is None and \
+                    self.g.distance(position, pacman, self.rollout_depth) == self.rollout_depth:
+                return self.rng.choice(moves)
+            move = self.g.next_step(position, pacman)
+            return self.rng.choice(moves) if move is None else move
+
+        _, coin = self.g.nearest(pacman, state.coins)
+        move = None if coin is None else self.g.next_step(pacman, coin)
+        # keep off the tiles the ghosts can reach next
+        unsafe = set(ghosts).union(*(self.g.graph[ghost] for ghost in ghosts))
+        if move is None or move in unsafe:
+            safe = [tile for tile in moves if tile not in unsafe]
+            if safe:
+                move = self.rng.choice(safe)
+            elif move is None:
+                move = self.rng.choice(moves)
+        return move
+
+    def rollout(self, state, pacman, ghosts, agent, count):
+        """
+        Play the cheap policy until the game ends or rollout_depth plies
+        :param count: coins left at the root
+        :return: reward from Pacman's point of view
+        """
+        agents = len(ghosts) + 1
+        for _ in range(self.rollout_depth):
+            move = self.rollout_move(state, pacman, ghosts, agent)
+            pacman, ghosts, reward = self.play(state, pacman, ghosts, agent, move)
+            if reward is not None:
+                return reward
+            agent = (agent + 1) % agents
+        # scored by the coins eaten per Pacman move since the root, then by the distance to the next coin
+        distance, _ = self.g.nearest(pacman, state.coins)
+        if distance is None:
+            distance = len(self.tiles)
+        return 0.5 + 0.4 * min(1.0, (count - state.count) * agents / self.rollout_depth) + 0.09 / (1 + distance)
+
+    def select(self, node):
+        """
+        UCT choice among the children, each agent maximizes its own share of the rewards
+        :return: (move, child)
+        """
+        log_visits = math.log(node.visits)
+        exploration = self.exploration
+        is_max = node.agent == 0
+
+        def uct(item):
+            child = item[1]
+            mean = child.value / child.visits
+            return (mean if is_max else 1 - mean) + exploration * math.sqrt(log_visits / child.visits)
+
+        return max(node.children.items(), key=uct)
+
+    def iterate(self, root, state, count):
+        """
+        One selection, expansion, rollout and backpropagation from the root
+        :param root: root node
+        :param state: game state of the root, left untouched
+        :param count: coins left at the root
+        """
+        state = state.copy()
+        pacman, ghosts = root.key[0], root.key[1]
+        agents = len(ghosts) + 1
+        node = root
+        path = [node]
+
+        # selection
+        while node.terminal is None and not node.untried and node.children:
+            parent = node
+            move, node = self.select(parent)
+            pacman, ghosts, _ = self.play(state, pacman, ghosts, parent.agent, move)
+            path.append(node)
+
+        # expansion
+        reward = node.terminal
+        if reward is None and node.untried:
+            move = node.untried.pop()
+            pacman, ghosts, reward = self.play(state, pacman, ghosts, node.agent, move)
+            child = self.node(state, pacman, ghosts, (node.agent + 1) % agents, reward)
+            node.children[move] = child
+            node = child
+            path.append(node)
+
+        # simulation
+        if reward is None:
+            reward = self.rollout(state, pacman, ghosts, node.agent, count)
+
+        # backpropagation
+        for node in path:
+            node.visits += 1
+            node.value += reward
+
+    def find_root(self, key):
+        """
+        Find the position in the tree kept from the last call, a few plies below its root
+        :param key: (pacman, ghosts, coins, agent)
+        :return: Node or None
+        """
+        level = [self.root] if self.root is not None else []
+        for _ in range(len(key[1]) + 2):
+            for node in level:
+                if node.key == key:
+                    return node
+            level = [child for node in level for child in node.children.values()]
+        return None
+
+    def search(self, state, pacman, ghosts, agent, budget=None, iterations=None):
+        """
+        Grow the tree from the position until the budget or the iterations are spent
+        :param state: game state, left untouched
+        :param pacman: pacman position
+        :param ghosts: tuple of ghosts positions
+        :param agent: agent to move
+        :param budget: time budget in milliseconds, None runs the iterations
+        :param iterations: rollouts to run, self.iterations when None
+        :return: dict of root move to visit count
+        """
+        key = (pacman, ghosts, state.coins, agent)
+        root = self.find_root(key)
+        self.reused = 0 if root is None else root.visits
+        if root is None:
+            root = self.node(state, pacman, ghosts, agent)
+        self.root = root
+
+        iterations = self.iterations if iterations is None else iterations
+        deadline = None if budget is None else time.perf_counter() + budget / 1000
+        count = state.count
+        done = 0
+        # the first rollout always runs, so every call has a move
+        while done < 1 or (time.perf_counter() < deadline if deadline is not None else done < iterations):
+            self.iterate(root, state, count)
+            done += 1
+        self.rollouts += done
+
+        return {move: child.visits for (move, child) in root.children.items()}
+
+    def parallel_search(self, state, pacman, ghosts, agent, budget=None):
+        """
+        Grow one tree per worker from the position and add up their root visit counts
+        Every worker keeps its own tree between calls
+        :return: dict of root move to visit count
+        """
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                            initargs=(self.layout, self.rollout_depth, self.exploration,
+                                                      self.epsilon, self.seed, self.width, self.g.table_limit))
+        iterations = -(-self.iterations // self.workers)
+        futures = [self.pool.submit(_search_worker, state.coins, state.count, pacman, ghosts, agent, budget,
+                                    iterations) for _ in range(self.workers)]
+        visits = {}
+        for future in futures:
+            worker_visits, rollouts = future.result()
+            self.rollouts += rollouts
+            for (move, count) in worker_visits.items():
+                visits[move] = visits.get(move, 0) + count
+        return visits
+
+    def close(self):
+        """
+        Stop the worker processes
+        """
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    def find_best_move(self, tiles, pacman, ghosts, is_pacman, budget=None, state=None):
+        """
+        Find best move for the agent, the most visited root move
+        Rollout counts are kept in self.rollouts and self.reused, rollouts_per_second() reports the speed
+        :param tiles: maze
+        :param pacman: pacman position
+        :param ghosts: list of ghosts positions
+        :param is_pacman: finding best move as for pacman or not
+        :param budget: time budget in milliseconds, shared by all ghosts; None runs self.iterations rollouts
+        :param state: game state kept in sync with tiles, built from tiles when None
+        :return: best move for the player
+        """
+        start = time.perf_counter()
+        self.rollouts = 0
+        if state is None:
+            state = self.new_state(tiles)
+        ghosts = tuple(ghosts)
+        search = self.search if self.workers == 1 else self.parallel_search
+
+        if is_pacman:
+            visits = search(state, pacman, ghosts, 0, budget)
+            self.elapsed = time.perf_counter() - start
+            return max(visits, key=visits.get)
+
+        # ghosts move one after another, each one searching with the moves of the previous ones made
+        ghosts_moves = []
+        for i in range(len(ghosts)):
+            # the game is over once a ghost has caught Pacman, the others stay where they are
+            if pacman in ghosts:
+                ghosts_moves.append(ghosts[i])
+                continue
+            visits = search(state, pacman, ghosts, i + 1, None if budget is None else budget / len(ghosts))
+            move = max(visits, key=visits.get)
+            ghosts = ghosts[:i] + (move,) + ghosts[i + 1:]
+            ghosts_moves.append(move)
+
+        self.elapsed = time.perf_counter() - start
+        return ghosts_moves
+
+
+# agent of a worker process, set up by _init_worker
+_worker = None
+
+
+def _init_worker(layout, rollout_depth, exploration, epsilon, seed, width, table_limit):
+    """
+    Build the worker's agent, every worker draws its own random rollouts
+    :param layout: roads of the maze, the coins come with every search
+    """
+    global _worker
+    _worker = MCTS(list(layout), rollout_depth=rollout_depth, exploration=exploration, epsilon=epsilon,
+                   seed=seed * 1000003 + os.getpid(), width=width, table_limit=table_limit)
+
+
+def _search_worker(coins, count, pacman, ghosts, agent, budget, iterations):
+    """
+    Grow the worker's tree from the position
+    :return: (dict of root move to visit count, rollouts run)
+    """
+    state = _worker.new_state(_worker.tiles)
+    state.coins, state.count = coins, count
+    _worker.rollouts = 0
+    visits = _worker.search(state, pacman, ghosts, agent, budget, iterations)
+    return visits, _worker.rollouts
+
+
+if __name__ == '__main__':
+    mcts = MCTS(graph.tiles[:])
+    tiles = graph.tiles[:]
+    state = mcts.new_state(tiles)
+    pacman, ghosts = 22, [342]
+    state.eat(pacman)
+    for _ in range(10):
+        pacman = mcts.find_best_move(tiles, pacman, ghosts, True, 50, state)
+        # the coin is eaten before the ghosts search, as in simulator.play_game, so their root is in the tree
+        state.eat(pacman)
+        print(f"Pacman move to {pacman}, {mcts.rollouts_per_second():.0f} rollouts/s, {mcts.reused} reused")
+        ghosts = mcts.find_best_move(tiles, pacman, ghosts, False, 50, state)
+        print(f"Ghost moves to {ghosts}, {mcts.reused} reused")
@@ -1,176 +1,751 @@
 import graph
 import math
+import multiprocessing
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from tablebase import Tablebase
+from transposition import DiskTable, TranspositionTable, Zobrist, maze_id
+
+# score of a game won at the root, a win n plies later scores WIN - n; heuristic values always stay far below it
+WIN = 1000000000
+# values beyond this are decided games, whatever the ply and the early-eating bonuses on the way
+DECIDED = WIN // 2
+# cost of moving into a position played before, one coin per earlier visit
+REPEAT = 10
+
+# transposition table bound flags
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+
+def to_table(value, ply):
+    """
+    Make a decided value relative to the position it is stored for, so it is valid at any ply
+    :param value: value relative to the root
+    :param ply: distance of the position from the root
+    :return: value to store in the transposition table
+    """
+    if value >= DECIDED:
+        return value + ply
+    if value <= -DECIDED:
+        return value - ply
+    return value
+
+
+def from_table(value, ply):
+    """
+    Undo to_table for a position found at another ply
+    :param value: value stored in the transposition table
+    :param ply: distance of the position from the root
+    :return: value relative to the root
+    """
+    if value >= DECIDED:
+        return value - ply
+    if value <= -DECIDED:
+        return value + ply
+    return value
+
+
+class SearchTimeout(Exception):
+    """Raised inside the search when the time budget of the move is spent"""
+
+
+class CoinBits:
+    """
+    Bit of every road tile in the coin bitset, made when it is asked for
+    Storing them would take O(roads^2) bits, too many on a generated maze of a million tiles
+    """
+
+    def __init__(self, road_index):
+        """
+        :param road_index: dict of the bit number of every road tile
+        """
+        self.index = road_index
+
+    def __getitem__(self, tile):
+        return 1 << self.index[tile]
+
+
+class GameState:
+    """
+    Coins left in the maze, kept up to date move by move instead of scanning the tiles
+    Coins are a bitset with one bit per road tile and a count of the set bits,
+    key is the xor of the Zobrist keys of the coins left
+    """
+
+    def __init__(self, tiles, coin_bit, coin_key):
+        """
+        Build it with Minimax.new_state, so the bits and keys match the agent's tables
+        :param tiles: maze
+        :param coin_bit: CoinBits of the roads
+        :param coin_key: Zobrist key of every road tile, the position keys tell coin sets apart by them
+        """
+        self.coin_bit = coin_bit
+        self.coin_key = coin_key
+        self.count = 0
+        self.key = 0
+        # the bitset is packed in bytes first, or every coin would copy the whole integer
+        bits = bytearray((len(coin_bit.index) + 7) // 8)
+        for road, k in coin_bit.index.items():
+            if tiles[road] == 1:
+                bits[k >> 3] |= 1 << (k & 7)
+                self.count += 1
+                self.key ^= coin_key[road]
+        self.coins = int.from_bytes(bits, 'little')
+
+    def copy(self):
+        """
+        :return: independent copy of the state
+        """
+        state = GameState.__new__(GameState)
+        state.coin_bit = self.coin_bit
+        state.coin_key = self.coin_key
+        state.coins = self.coins
+        state.count = self.count
+        state.key = self.key
+        return state
+
+    def has_coin(self, tile):
+        """
+        :param tile: tile index
+        :return: True if the tile still has a coin
+        """
+        return bool(self.coins & self.coin_bit[tile])
+
+    def eat(self, tile):
+        """
+        Eat the coin on the tile if there is one
+        :param tile: tile index
+        :return: True if a coin was eaten
+        """
+        bit = self.coin_bit[tile]
+        if self.coins & bit:
+            self.coins ^= bit
+            self.count -= 1
+            self.key ^= self.coin_key[tile]
+            return True
+        return False
+
+    def uneat(self, tile):
+        """
+        Put back the coin eaten on the tile, undoes eat()
+        :param tile: tile index
+        """
+        self.coins |= self.coin_bit[tile]
+        self.count += 1
+        self.key ^= self.coin_key[tile]
 
 
 class Minimax:
 
     # Constructor
-    def __init__(self, tiles):
+    def __init__(self, tiles, depth=10, pruning=True, tt_size=1000000, workers=1, flow_ghosts=False,
+                 greedy_budget=None, tt_path=None, preload=False, tablebase=None, width=20,
+                 table_limit=graph.TABLE_LIMIT):
+        """
+        :param tiles: maze
+        :param depth: maximum search depth in plies, every agent move is a ply
+        :param pruning: use alpha-beta cutoffs and the transposition table
+        :param tt_size: number of transposition table slots
+        :param workers: processes searching the root moves in parallel, 1 searches in this process
+        :param flow_ghosts: ghosts follow a shared flow field toward Pacman instead of searching
+        :param greedy_budget: Pacman moves by a greedy best-first search of at most this many nodes
+        toward the closest coin instead of searching, None searches
+        :param tt_path: file written by save_table, probed read-only when the in-memory table misses
+        :param preload: read the whole tt_path file in at startup
+        :param tablebase: endgame file written by tablebase.generate, its positions are played perfectly
+        :param width: row length of the maze
+        :param table_limit: roads above which distances come from cached BFS fields instead of all-pairs tables,
+        None always builds the tables
+        """
         self.tiles = tiles
-        self.g = graph.Graph(tiles)
+        self.width = width
+        # roads of the maze whether their coin was eaten or not, the game keeps changing tiles
+        self.layout = bytes(1 if tile else 0 for tile in tiles)
+        self.g = graph.Graph(list(self.layout), width)
+        self.g.table_limit = table_limit
+        self.g.use_tables()
+        self.depth = depth
+        self.pruning = pruning
+        self.tt_size = tt_size
+
+        # bit of every road tile in the coin bitset
+        self.coin_bit = CoinBits(self.g.road_index)
+
+        # positions are keyed by Zobrist hashing, the coin part is kept up to date by GameState
+        self.zobrist = Zobrist(self.g.roads)
+        self.tt = TranspositionTable(tt_size)
+        self.tt_path = tt_path
+        self.disk = None if tt_path is None else DiskTable(tt_path, maze_id(tiles), self.zobrist.seed, preload)
+        self.tablebase = None if tablebase is None else Tablebase(tablebase, tiles, width)
+        self.killers = []
+        self.history = defaultdict(int)
+        # times every position was played so far in the game, a root move reaching one again costs the side making it
+        self.played = defaultdict(int)
+
+        # search statistics of the last find_best_move call
+        self.nodes = 0
+        self.cutoffs = 0
+        self.tt_hits = 0
+        self.completed_depth = 0
+        self.root_move = None
+        self.deadline = None
+
+        # ghosts chasing Pacman read their moves from one shared field
+        self.flow_ghosts = flow_ghosts
+        self.flow = graph.FlowField(self.g)
+
+        self.greedy_budget = greedy_budget
+
+        # root-split search processes, started by the first parallel search
+        self.workers = workers
+        self.pool = None
+        self.shared_tiles = None
+        self.bound = None
+
+    def next_step(self, start, target):
+        """
+        Next tile on the shortest path from start toward target
+        :param start: starting point
+        :param target: target point
+        :return: tile index
+        """
+        return self.g.next_step(start, target)
+
+    def new_state(self, tiles):
+        """
+        Create the game state for the maze, numbered the same way as the distance tables
+        :param tiles: maze
+        :return: GameState
+        """
+        return GameState(tiles, self.coin_bit, self.zobrist.coin)
 
-    def is_moves_left(self, tiles):
+    def is_moves_left(self, state):
         """
         Check if there are moves left in the maze
         TODO: add current position if the agent is Pacman and check if the move that was made leads to the ghost
-        :param tiles: maze
+        :param state: game state
         :return: True if there are coins left in the maze
         """
-        return len([tile for tile in tiles if tile == 1]) > 0
+        return state.count > 0
 
-    def evaluate(self, tiles, pacman, ghost):
+    def evaluate(self, state, pacman, ghosts, ply=0):
         """
         Evaluation function
         Evaluate the move was made for each agent
-        :param tiles: maze
+        A capture is checked first, eating the last coin on a ghost's tile loses as in simulator.play_game
+        :param state: game state
         :param pacman: pacman position
-        :param ghost: ghost position
-        :return: +10 if Pacman has won in this move, -10 if ghost has eaten the pacman(pacman lost), 0 otherwise
+        :param ghosts: tuple of ghosts positions
+        :param ply: distance from the root, a sooner win and a later loss score better
+        :return: WIN - ply if Pacman has won in this move, -WIN + ply if a ghost has eaten the pacman(pacman lost),
+                 0 otherwise
         """
 
-        # pacman has eaten all coins
-        if not len([tile for tile in tiles if tile == 1]):
-            return 10
-
         # ghost has eaten the pacman
-        if ghost == pacman:
-            return -10
+        if pacman in ghosts:
+            return -WIN + ply
+
+        # pacman has eaten all coins
+        if not state.count:
+            return WIN - ply
 
         # nobody won
         return 0
 
-    def closest_coin(self, tiles, pacman):
+    def closest_coin(self, tiles, pacman, state=None):
         """
-        Get the closest coin to the pacman position
+        Get the closest coin to the pacman position by maze distance
         :param tiles: maze
         :param pacman: pacman position
+        :param state: game state kept in sync with tiles, built from tiles when None
         :return: coin index
         """
-        coin = math.inf
-        min_distance = math.inf
+        if state is None:
+            state = self.new_state(tiles)
+        _, coin = self.g.nearest(pacman, state.coins)
+        return coin
 
-        def convert_from_raw(raw_pos):
-            # complex high-level mathematics
-            x = (raw_pos % 20) * 20 - 200
-            y = 180 - (raw_pos // 20) * 20
-            return x, y
+    def closest_coin_distance(self, coins, pacman):
+        """
+        Get the closest coin to the pacman position by maze distance
+        :param coins: coin bitset
+        :param pacman: pacman position
+        :return: (distance, coin index)
+        """
+        return self.g.nearest(pacman, coins)
 
-        pac_x, pac_y = convert_from_raw(pacman)
-        pacman_vec = (pac_x, pac_y)
+    def heuristic(self, state, pacman, ghosts):
+        """
+        Estimate a position at the depth limit
+        Fewer coins and a closer coin are better for Pacman, a ghost within 5 steps is worse;
+        coins Pacman cannot reach count as len(tiles) steps away, the same everywhere Pacman can go
+        :param state: game state
+        :param pacman: pacman position
+        :param ghosts: tuple of ghosts positions
+        :return: score from Pacman's point of view
+        """
+        distance, _ = self.closest_coin_distance(state.coins, pacman)
+        if distance is None:
+            distance = len(self.tiles)
+        danger = min(self.g.distance(pacman, ghost, 5) for ghost in ghosts)
+        return -10 * state.count - distance + danger
 
-        for i, tile in enumerate(tiles):
-            if tile == 1:
-                coin_x, coin_y = convert_from_raw(i)
-                coin_vec = (coin_x, coin_y)
-                distance = math.sqrt(sum([(a - b) ** 2 for a, b in zip(coin_vec, pacman_vec)]))
-                if distance < min_distance:
-                    coin = i
-                    min_distance = distance
+    def greedy_move(self, state, pacman, ghosts):
+        """
+        Fast approximate Pacman move: greedy best-first search toward the closest coin
+        that never steps next to a ghost, within self.greedy_budget expanded nodes
+        :param state: game state
+        :param pacman: pacman position
+        :param ghosts: tuple of ghosts positions
+        :return: next tile, None when no coin can be approached safely
+        """
+        _, coin = self.closest_coin_distance(state.coins, pacman)
+        if coin is None:
+            return None
+
+        def heuristic(u, v):
+            if any(self.g.distance(u, ghost, 2) <= 1 for ghost in ghosts):
+                return math.inf
+            return self.g.manhattan(u, v)
+
+        path = self.g.Greedy(pacman, coin, heuristic, self.greedy_budget)
+        self.nodes = self.g.expanded
+        if path is None or len(path) < 2:
+            return None
+        return path[1]
+
+    def order_moves(self, position, target, ply, tt_move):
+        """
+        Order the moves for the alpha-beta search
+        Transposition table move first, then the shortest path step toward the target,
+        then killer moves of this ply, then by history score
+        :param position: position of the agent to move
+        :param target: tile the agent heads for, None if it has none
+        :param ply: distance from the root
+        :param tt_move: best move stored in the transposition table or None
+        :return: list of moves
+        """
+        principal = None if target is None else self.next_step(position, target)
+        killers = self.killers[ply]
+        history = self.history
 
-        return coin
+        return sorted(self.g.graph[position], key=lambda move: (
+            move != tt_move,
+            move != principal,
+            move not in killers,
+            -history[(position, move)]))
 
-    def minimax(self, tiles, pacman, ghost, depth, is_max):
+    def minimax(self, state, pacman, ghosts, depth, agent, alpha=-math.inf, beta=math.inf, ply=0, key=None):
         """
-        Minimax algorithm
-        It considers all the possible ways the game can go
-        :param tiles: maze
+        Minimax algorithm with alpha-beta pruning
+        Pacman (agent 0) is the Maximizer, every ghost (agent 1..n) is a Minimizer
+        The best move at the root is stored in self.root_move
+        :param state: game state, eaten coins are made and unmade on it
         :param pacman: pacman position
-        :param ghost: ghost position
-        :param depth: depth of the current move
-        :param is_max: is agent Maximizer or Minimizer
-        :return: the value of moves
+        :param ghosts: tuple of ghosts positions
+        :param depth: plies left to search
+        :param agent: agent to move
+        :param alpha: best value the Maximizer is assured of
+        :param beta: best value the Minimizer is assured of
+        :param ply: distance from the root
+        :param key: Zobrist key of the position, updated move by move; computed from scratch when None
+        :return: the value of the position
         """
+        self.nodes += 1
+        if self.deadline is not None and not self.nodes & 63 and time.perf_counter() >= self.deadline:
+            raise SearchTimeout
 
-        score = self.evaluate(tiles, pacman, ghost)
+        score = self.evaluate(state, pacman, ghosts, ply)
 
         # Maximizer or Minimizer won the game
-        if score == -10 or score == 10:
+        if score:
             return score
 
+        zobrist = self.zobrist
+        if key is None:
+            key = zobrist.key(state.key, pacman, ghosts, agent)
+
         # limit moves by depth
-        if depth >= 100:
-            return score
+        if depth == 0:
+            return self.heuristic(state, pacman, ghosts)
+        entry = None
+        if self.pruning:
+            entry = self.tt.probe(key)
+            if entry is None and self.disk is not None:
+                entry = self.disk.probe(key)
+        tt_move = None
+        if entry is not None:
+            entry_depth, value, flag, tt_move = entry
+            if ply and entry_depth >= depth:
+                self.tt_hits += 1
+                value = from_table(value, ply)
+                if flag == EXACT:
+                    return value
+                if flag == LOWER and value >= beta:
+                    return value
+                if flag == UPPER and value <= alpha:
+                    return value
+
+        # best move of the previous iteration is searched first
+        if ply == 0 and self.root_move is not None:
+            tt_move = self.root_move
+
+        while len(self.killers) <= ply:
+            self.killers.append([None, None])
+
+        alpha_start, beta_start = alpha, beta
+        next_agent = (agent + 1) % (len(ghosts) + 1)
+        is_max = agent == 0
+        best, best_move = (-math.inf if is_max else math.inf), None
 
-        # pacman's move
         if is_max:
-            best = -math.inf
-
-            coin = self.closest_coin(tiles, pacman)
-            path = self.g.UCS(pacman, coin)
-            move = path[1]
-
-            # eat the coin
-            if tiles[move] == 1:
-                tiles[move] = 2
+            _, target = self.closest_coin_distance(state.coins, pacman)
+            position = pacman
+            keys = zobrist.pacman
+        else:
+            target = pacman
+            position = ghosts[agent - 1]
+            keys = zobrist.ghost[agent - 1]
+        # the side to move and the moving agent's old tile leave the key of every child
+        base = key ^ zobrist.side[agent] ^ zobrist.side[next_agent] ^ keys[position]
+
+        # moving back into a position of the game costs the side that does it, more for every earlier visit,
+        # so neither Pacman nor a ghost guarding it can shuffle back and forth forever;
+        # the cost depends on the game so far, so only the root moves pay it and the root value is not stored
+        played = self.played if ply == 0 else {}
+        for move in self.order_moves(position, target, ply, tt_move):
             # make the move
-            pacman = move
-            # call minimax
-            best = max(best, self.minimax(tiles, pacman, ghost, depth + 1, not is_max))
+            if is_max:
+                eaten = state.eat(move)
+                child = base ^ keys[move] ^ (state.coin_key[move] if eaten else 0)
+                # a coin eaten with more plies left scores more, so Pacman never puts eating off;
+                # a position with fewer coins was never played before
+                bonus = depth if eaten else -REPEAT * played.get(child, 0)
+                value = bonus + self.minimax(state, move, ghosts, depth - 1, next_agent, alpha - bonus, beta - bonus,
+                                             ply + 1, child)
+                # undo the move
+                if eaten:
+                    state.uneat(move)
+            else:
+                moved = ghosts[:agent - 1] + (move,) + ghosts[agent:]
+                child = base ^ keys[move]
+                bonus = REPEAT * played.get(child, 0)
+                value = bonus + self.minimax(state, pacman, moved, depth - 1, next_agent, alpha - bonus, beta - bonus,
+                                             ply + 1, child)
+
+            if (value > best) if is_max else (value < best):
+                best, best_move = value, move
+            if is_max:
+                alpha = max(alpha, best)
+            else:
+                beta = min(beta, best)
+
+            if self.pruning and alpha >= beta:
+                self.cutoffs += 1
+                killers = self.killers[ply]
+                if move != killers[0]:
+                    killers[1] = killers[0]
+                    killers[0] = move
+                self.history[(position, move)] += depth * depth
+                break
+
+        if self.pruning and ply:
+            if best <= alpha_start:
+                flag = UPPER
+            elif best >= beta_start:
+                flag = LOWER
+            else:
+                flag = EXACT
+            self.tt.store(key, (depth, to_table(best, ply), flag, best_move))
+
+        if ply == 0:
+            self.root_move = best_move
+
+        return best
+
+    def search(self, state, pacman, ghosts, agent, deadline=None):
+        """
+        Iterative deepening search for one agent
+        Every iteration goes one ply deeper, reusing the previous best move for ordering
+        :param state: game state, left untouched
+        :param pacman: pacman position
+        :param ghosts: tuple of ghosts positions
+        :param agent: agent to move
+        :param deadline: time.perf_counter() value to stop at, None to always search to self.depth
+        :return: best move of the deepest finished iteration, the agent's own tile if the game is already decided
+        """
+        self.root_move = None
+        self.deadline = None
+        best_move = None
+        # a timeout unwinds the search without undoing its moves
+        state = state.copy()
+
+        for depth in range(1, self.depth + 1):
+            try:
+                value = self.minimax(state, pacman, ghosts, depth, agent)
+            except SearchTimeout:
+                break
+            best_move = self.root_move
+            self.completed_depth = depth
+
+            # the game is decided, searching deeper changes nothing
+            if abs(value) >= DECIDED:
+                break
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            # the first iteration always finishes, so there is a move to return
+            self.deadline = deadline
+
+        self.deadline = None
+        # a decided root has no move to search, the agent stays where it is
+        if best_move is None:
+            best_move = pacman if agent == 0 else ghosts[agent - 1]
+        return best_move
+
+    def reset(self):
+        """
+        Forget the positions searched and played in earlier games
+        """
+        self.tt.clear()
+        self.played.clear()
 
-            # undo the move
-            if tiles[move] == 2:
-                tiles[move] = 1
+    def save_table(self, path):
+        """
+        Write the transposition table to a file for later runs to map with tt_path
+        Probe counts of both tables are in self.tt and self.disk, their hit_rate() helps size tt_size
+        :param path: file path
+        """
+        self.tt.save(path, maze_id(self.tiles), self.zobrist.seed)
 
-            return best
+    def start_pool(self):
+        """
+        Start the root-split worker processes
+        The maze layout is handed to them through a shared memory tile buffer and every worker builds its own
+        tables once; the coins come with every search
+        """
+        self.shared_tiles = shared_memory.SharedMemory(create=True, size=len(self.layout))
+        self.shared_tiles.buf[:len(self.layout)] = self.layout
+        # best root value found so far, alpha for Pacman and beta for a ghost
+        self.bound = multiprocessing.Value('d', 0.0)
+        self.pool = ProcessPoolExecutor(
+            max_workers=self.workers, initializer=_init_root_worker,
+            initargs=(self.shared_tiles.name, len(self.layout), self.tt_size, self.bound, self.tt_path,
+                      self.width, self.g.table_limit))
+
+    def close(self):
+        """
+        Stop the root-split worker processes and free the shared tile buffer
+        """
+        if self.pool is not None:
+            try:
+                self.pool.shutdown()
+            finally:
+                self.shared_tiles.close()
+                self.shared_tiles.unlink()
+                self.pool = self.shared_tiles = self.bound = None
+
+    def parallel_search(self, state, pacman, ghosts, agent, deadline=None):
+        """
+        Iterative deepening search for one agent with the root moves split across worker processes
+        Every worker narrows its window with the best root value the others have found so far
+        :param state: game state, left untouched
+        :param pacman: pacman position
+        :param ghosts: tuple of ghosts positions
+        :param agent: agent to move
+        :param deadline: time.perf_counter() value to stop at, None to always search to self.depth
+        :return: best move of the deepest finished iteration, the agent's own tile if the game is already decided
+        """
+        if self.pool is None:
+            self.start_pool()
 
-        # ghost's move
+        is_max = agent == 0
+        if is_max:
+            _, target = self.closest_coin_distance(state.coins, pacman)
+            position = pacman
         else:
-            best = math.inf
-
-            path = self.g.UCS(ghost, pacman)
-            move = path[1]
-            ghost = move
-            best = min(best, self.minimax(tiles, pacman, ghost, depth + 1, not is_max))
-
-            return best
-
-    def find_best_move(self, tiles, pacman, ghosts, is_pacman):
+            target = pacman
+            position = ghosts[agent - 1]
+        if not self.killers:
+            self.killers.append([None, None])
+
+        best_move = None
+        for depth in range(1, self.depth + 1):
+            moves = self.order_moves(position, target, 0, best_move)
+            if not moves:
+                break
+            self.bound.value = -math.inf if is_max else math.inf
+            # the first iteration always finishes, so there is a move to return
+            try:
+                futures = [self.pool.submit(_search_root_move, state.coins, state.count, state.key, pacman, ghosts,
+                                            agent, move, depth, deadline if depth > 1 else None, self.played)
+                           for move in moves]
+                results = [future.result() for future in futures]
+            except BaseException:
+                # a failed worker breaks the pool, stop it and free the shared tiles before passing the error on
+                self.close()
+                raise
+            if None in results:
+                break
+
+            sign = 1 if is_max else -1
+            best_key = None
+            for (move, (value, exact, nodes)) in zip(moves, results):
+                self.nodes += nodes
+                # moves that failed low on the shared bound are no better than the move that set it
+                if exact and (best_key is None or sign * value > best_key):
+                    best_key, best, best_move = sign * value, value, move
+            self.completed_depth = depth
+
+            if abs(best) >= DECIDED:
+                break
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+
+        return position if best_move is None else best_move
+
+    def find_best_move(self, tiles, pacman, ghosts, is_pacman, budget=None, state=None):
         """
         Find best move for the agent
+        Node, cutoff and transposition table hit counts are kept in self.nodes, self.cutoffs and self.tt_hits,
+        the depth of the last finished iteration in self.completed_depth
         :param tiles: maze
         :param pacman: pacman position
         :param ghosts: list of ghosts positions
         :param is_pacman: finding best move as for pacman or not
+        :param budget: time budget in milliseconds, shared by all ghosts; None searches to self.depth
+        :param state: game state kept in sync with tiles, built from tiles when None
         :return: best move for the player
         """
+        self.nodes = self.cutoffs = self.tt_hits = 0
+        self.completed_depth = 0
+        self.tt.new_search()
+        self.killers = []
+        self.history.clear()
+
+        if state is None:
+            state = self.new_state(tiles)
+        ghosts = tuple(ghosts)
+        search = self.search if self.workers == 1 else self.parallel_search
+
+        # decided endgames are looked up instead of searched
+        if self.tablebase is not None and len(ghosts) == 1 and state.count <= self.tablebase.max_coins:
+            move = self.tablebase.best_move(state.coins, pacman, ghosts[0], is_pacman)
+            if move is not None:
+                return move if is_pacman else [move]
 
         if is_pacman:
-            best_val = -math.inf
-            best_move = -math.inf
-
-            for ghost in ghosts:
-                coin = self.closest_coin(tiles, pacman)
-                path = self.g.UCS(pacman, coin)
-                move = path[1]
-
-                # eat the coin
-                if tiles[move] == 1:
-                    tiles[move] = 2
-                # make the move
-                pacman = move
-                move_val = self.minimax(tiles, pacman, ghost, 0, False)
-
-                # undo the move
-                if tiles[move] == 2:
-                    tiles[move] = 1
-
-                if move_val > best_val:
-                    best_val = move_val
-                    best_move = move
-
-            return best_move
-
-        else:
-
-            ghosts_moves = []
-
-            for path in [self.g.UCS(ghost, pacman) for ghost in ghosts]:
-                if len(path) > 1:
-                    ghosts_moves.append(path[1])
-                else:
-                    ghosts_moves.append(path[0])
-
-            return ghosts_moves
+            if self.greedy_budget is not None:
+                move = self.greedy_move(state, pacman, ghosts)
+                if move is not None:
+                    return move
+            deadline = None if budget is None else time.perf_counter() + budget / 1000
+            self.played[self.zobrist.key(state.key, pacman, ghosts, 0)] += 1
+            return search(state, pacman, ghosts, 0, deadline)
+
+        if self.flow_ghosts:
+            self.flow.update(pacman)
+            return [self.flow.next_step(ghost) for ghost in ghosts]
+
+        # ghosts move one after another, each one searching with the moves of the previous ones made
+        ghosts_moves = []
+        for i in range(len(ghosts)):
+            # the game is over once a ghost has caught Pacman, the others stay where they are
+            if pacman in ghosts:
+                ghosts_moves.append(ghosts[i])
+                continue
+            deadline = None if budget is None else time.perf_counter() + budget / 1000 / len(ghosts)
+            self.played[self.zobrist.key(state.key, pacman, ghosts, i + 1)] += 1
+            move = search(state, pacman, ghosts, i + 1, deadline)
+            ghosts = ghosts[:i] + (move,) + ghosts[i + 1:]
+            ghosts_moves.append(move)
+
+        return ghosts_moves
+
+
+# agent of a root-split worker process, its game state and the shared bound, set up by _init_root_worker
+_worker = None
+_worker_state = None
+_worker_bound = None
+
+
+def _init_root_worker(name, size, tt_size, bound, tt_path, width, table_limit):
+    """
+    Build the worker's agent from the shared tile buffer
+    :param name: shared memory name of the tile buffer
+    :param size: number of tiles
+    :param tt_size: number of transposition table slots
+    :param bound: shared best root value
+    :param tt_path: disk transposition table, mapped read-only by every worker
+    :param width: row length of the maze
+    :param table_limit: roads above which the worker walks BFS fields instead of building the tables
+    """
+    global _worker, _worker_state, _worker_bound
+    shared_tiles = shared_memory.SharedMemory(name=name)
+    tiles = list(shared_tiles.buf[:size])
+    shared_tiles.close()
+
+    _worker = Minimax(tiles, tt_size=tt_size, tt_path=tt_path, width=width, table_limit=table_limit)
+    _worker_state = _worker.new_state(tiles)
+    _worker_bound = bound
+
+
+def _search_root_move(coins, count, key, pacman, ghosts, agent, move, depth, deadline, played):
+    """
+    Search one root move in a worker process
+    :param coins: coin bitset
+    :param count: number of coins left
+    :param key: Zobrist key of the coins left
+    :param pacman: pacman position
+    :param ghosts: tuple of ghosts positions
+    :param agent: agent to move at the root
+    :param move: root move to search
+    :param depth: depth of the root search
+    :param deadline: time.perf_counter() value to stop at or None
+    :param played: keys of the positions played so far in the game
+    :return: (value, exact, nodes), exact is False when the value only bounds a move no better than the best one;
+             None if the deadline hit
+    """
+    state = _worker_state.copy()
+    state.coins, state.count, state.key = coins, count, key
+    is_max = agent == 0
+
+    with _worker_bound.get_lock():
+        bound = _worker_bound.value
+    alpha, beta = (bound, math.inf) if is_max else (-math.inf, bound)
+
+    # make the move, scored as Minimax.minimax scores it
+    next_agent = (agent + 1) % (len(ghosts) + 1)
+    if is_max:
+        eaten = state.eat(move)
+        pacman = move
+    else:
+        ghosts = ghosts[:agent - 1] + (move,) + ghosts[agent:]
+    child = _worker.zobrist.key(state.key, pacman, ghosts, next_agent)
+    if is_max:
+        bonus = depth if eaten else -REPEAT * played.get(child, 0)
+    else:
+        bonus = REPEAT * played.get(child, 0)
+
+    _worker.nodes = 0
+    _worker.deadline = deadline
+    try:
+        value = bonus + _worker.minimax(state, pacman, ghosts, depth - 1, next_agent, alpha - bonus, beta - bonus, 1,
+                                        child)
+    except SearchTimeout:
+        return None
+    finally:
+        _worker.deadline = None
+
+    with _worker_bound.get_lock():
+        if (value > _worker_bound.value) if is_max else (value < _worker_bound.value):
+            _worker_bound.value = value
+
+    return value, (value > bound) if is_max else (value < bound), _worker.nodes
 
 
 if __name__ == '__main__':
@@ -206,13 +781,15 @@ if __name__ == '__main__':
         # ghosts = [161]
 
         minimax = Minimax(tiles)
+        state = minimax.new_state(tiles)
         for i in range(10):
             tiles[pacman] = 2
-            pacman_move = minimax.find_best_move(tiles, pacman, ghosts, True)
+            state.eat(pacman)
+            pacman_move = minimax.find_best_move(tiles, pacman, ghosts, True, state=state)
             print(f"Pacman move from {pacman} to {pacman_move}")
             pacman = pacman_move
 
-            for i, ghost_move in enumerate(minimax.find_best_move(tiles, pacman, ghosts, False)):
+            for i, ghost_move in enumerate(minimax.find_best_move(tiles, pacman, ghosts, False, state=state)):
                 print(f"Ghost {i} move from {ghosts[i]} to {ghost_move}")
                 ghosts[i] = ghost_move
                 if ghost_move == pacman:
@@ -2,6 +2,7 @@ from turtle import *
 from freegames import floor, vector
 import random
 import time
+from concurrent.futures import ThreadPoolExecutor
 from minimax import Minimax
 
 state = {'score': 0}
@@ -17,8 +18,18 @@ pacman_raw = None
 #     [vector(100, -160), vector(-20, 0)]
 # ]
 num_ghosts = 1 #for now
+# milliseconds between screen updates, per turn, and of a turn each side may spend searching
+tick_time = 50
+turn_time = 300
+think_time = 100
+# Pacman moves before the game is called a draw, as in simulator.play_game
+max_turns = 300
+turns = 0
 ghosts = []
 ghosts_raw = []
+game = None
+# tiles per row of the maze
+width = 20
 tiles = [
     0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0,
     0, 1, 1, 1, 1, 1, 1, 1, 0, 1, 1, 1, 1, 1, 1, 1, 0, 0, 0, 0,
@@ -59,9 +70,10 @@ def square(x, y):
 
 def offset(point):
     "Return offset of point in tiles."
-    x = (floor(point.x, 20) + 200) / 20
-    y = (180 - floor(point.y, 20)) / 20
-    index = int(x + y * 20)
+    height = len(tiles) // width
+    x = (floor(point.x, 20) + width * 10) / 20
+    y = (height * 10 - 20 - floor(point.y, 20)) / 20
+    index = int(x + y * width)
     return index
 
 
@@ -91,8 +103,7 @@ def world():
         tile = tiles[index]
 
         if tile > 0:
-            x = (index % 20) * 20 - 200
-            y = 180 - (index // 20) * 20
+            x, y = convert_from_raw(index)
             square(x, y)
 
             if tile == 1:
@@ -121,44 +132,93 @@ def world():
         ghosts_raw.append(ghost_raw)
 
 
-def move(point, way, is_pacman):
-    """Move point"""
-    writer.undo()
-    writer.write(state['score'])
-
-    clear()
-
-    point.move(way)
-
-    if is_pacman:
-        index = offset(point)
-
-        if tiles[index] == 1:
-            tiles[index] = 2
-            state['score'] += 1
-            x, y = convert_from_raw(index)
-            square(x, y)
-
-    up()
-    goto(point.x + 10, point.y + 10)
-
-    if is_pacman:
-        dot(20, 'yellow')
-    else:
-        dot(20, 'red')
-
-    update()
+class Renderer:
+    """
+    Draw the changes of a turn in one batch
+    Eaten coins are dirty tiles painted over on the maze, every agent has its own turtle,
+    so moving it only replaces its own dot; nothing is redrawn until flush
+    """
+
+    def __init__(self, colors):
+        """
+        :param colors: dot color of every agent, Pacman first
+        """
+        self.colors = colors
+        self.sprites = [Turtle(visible=False) for _ in colors]
+        for sprite in self.sprites:
+            sprite.up()
+        self.positions = [None] * len(colors)
+        self.dirty_tiles = set()
+        self.dirty_agents = set()
+        self.score = state['score']
+        # seconds spent drawing every frame
+        self.frame_times = []
+
+    def eat(self, index):
+        """
+        :param index: tile whose coin was eaten
+        """
+        self.dirty_tiles.add(index)
+
+    def move(self, agent, index):
+        """
+        :param agent: 0 for Pacman, i + 1 for ghost i
+        :param index: tile the agent stands on
+        """
+        if self.positions[agent] != index:
+            self.positions[agent] = index
+            self.dirty_agents.add(agent)
+
+    def flush(self):
+        """
+        Draw the dirty tiles, the agents that moved and the score, then update the screen once
+        Nothing is drawn and no frame is counted when nothing changed
+        """
+        if not self.dirty_tiles and not self.dirty_agents and self.score == state['score']:
+            return
+        start = time.perf_counter()
+
+        for index in self.dirty_tiles:
+            square(*convert_from_raw(index))
+        # a repainted tile covers the dot of an agent standing on it
+        self.dirty_agents.update(agent for (agent, index) in enumerate(self.positions) if index in self.dirty_tiles)
+
+        for agent in self.dirty_agents:
+            sprite = self.sprites[agent]
+            sprite.clear()
+            x, y = convert_from_raw(self.positions[agent])
+            sprite.goto(x + 10, y + 10)
+            sprite.dot(20, self.colors[agent])
+
+        if self.score != state['score']:
+            self.score = state['score']
+            writer.undo()
+            writer.write(self.score)
+
+        self.dirty_tiles.clear()
+        self.dirty_agents.clear()
+        update()
+        self.frame_times.append(time.perf_counter() - start)
+
+    def report(self):
+        """
+        :return: frame time summary
+        """
+        times = self.frame_times
+        return (f"{len(times)} frames, mean {sum(times) / len(times) * 1000:.2f} ms, "
+                f"max {max(times) * 1000:.2f} ms per frame")
 
 
 def convert_from_raw(raw_pos):
-    # complex high-level mathematics
-    x = (raw_pos % 20) * 20 - 200
-    y = 180 - (raw_pos // 20) * 20
+    # complex high-level mathematics, the maze is centered on the screen
+    height = len(tiles) // width
+    x = (raw_pos % width) * 20 - width * 10
+    y = height * 10 - 20 - (raw_pos // width) * 20
     return x, y
 
 
 def random_init():
-    raw_pos = random.randint(0, len(tiles))
+    raw_pos = random.randint(0, len(tiles) - 1)
     if tiles[raw_pos] == 0:
         while tiles[raw_pos] != 1:
             raw_pos = (raw_pos + 1) % len(tiles)
@@ -169,46 +229,157 @@ def random_init():
 
 
 def is_end():
-    # ghost has eaten the pacman or pacman has eaten all coins
-    return len([ghost for ghost in ghosts if ghost == pacman]) or not len([tile for tile in tiles if tile == 1])
-
-
-def agent_move(prev, next, is_pacman):
-    x, y = convert_from_raw(prev)
-    point = vector(x, y)
-    if next == prev + 1:
-        move(point, vector(20, 0), is_pacman)
-    elif next == prev - 1:
-        move(point, vector(-20, 0), is_pacman)
-    elif next < prev:
-        move(point, vector(0, 20), is_pacman)
-    elif next > prev:
-        move(point, vector(0, -20), is_pacman)
+    # ghost has eaten the pacman, pacman has eaten all coins or the game ran out of turns
+    return pacman_raw in ghosts_raw or not game.count or turns >= max_turns
+
+
+class GameLoop:
+    """
+    Fixed tick game loop on the turtle timer
+    The AI searches in a background thread and posts its moves back through a future, so the screen keeps
+    drawing while it thinks; a side whose move is not ready by its deadline plays its last known best move
+    """
+
+    def __init__(self, minimax, renderer):
+        """
+        :param minimax: agent of both sides
+        :param renderer: Renderer of the game
+        """
+        self.minimax = minimax
+        self.renderer = renderer
+        # one thread, so the searches never overlap on the agent
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.future = None
+        self.is_pacman = True
+        self.started = 0
+        self.turn_start = 0
+        # a search gets its budget and one tick to post its move
+        self.wait = (think_time + tick_time) / 1000
+        # seconds from a search request until its move was played, and the number of deadlines missed
+        self.latencies = []
+        self.misses = 0
+
+    def start(self):
+        self.renderer.flush()
+        ontimer(self.tick, tick_time)
+
+    def search(self, is_pacman):
+        """
+        Start a search on copies of the game, the loop keeps changing the originals
+        :param is_pacman: search for Pacman or the ghosts
+        """
+        self.is_pacman = is_pacman
+        self.started = time.perf_counter()
+        self.future = self.executor.submit(self.think, self.started + think_time / 1000, tiles[:], pacman_raw,
+                                           list(ghosts_raw), is_pacman, game.copy())
+
+    def think(self, deadline, maze, pacman, ghosts, is_pacman, state):
+        """
+        Search in the background thread with the time left until the deadline
+        The deadline is set when the search is requested, so a search queued behind a late one only gets
+        what is left of its budget instead of missing its own deadline too
+        :param deadline: time.perf_counter() value the move is due at
+        :param maze: copy of the tiles
+        :param pacman: pacman position
+        :param ghosts: list of ghosts positions
+        :param is_pacman: search for Pacman or the ghosts
+        :param state: copy of the game state
+        :return: move of find_best_move, a search out of time still finishes its first iteration
+        """
+        budget = max(deadline - time.perf_counter(), 0) * 1000
+        return self.minimax.find_best_move(maze, pacman, ghosts, is_pacman, budget, state)
+
+    def fallback(self):
+        """
+        Move of a side that missed its deadline
+        :return: the best move of Pacman's last finished iteration or the step toward the closest coin,
+                 the ghosts step toward Pacman
+        """
+        minimax = self.minimax
+        if not self.is_pacman:
+            return [minimax.next_step(ghost, pacman_raw) for ghost in ghosts_raw]
+        move = minimax.root_move
+        if move in minimax.g.graph[pacman_raw]:
+            return move
+        return minimax.next_step(pacman_raw, minimax.closest_coin(tiles, pacman_raw, game))
+
+    def play(self, move):
+        """
+        Play the move of the side that was searching
+        :param move: Pacman's tile or the ghosts' tiles
+        """
+        global pacman_raw, turns
+        if self.is_pacman:
+            turns += 1
+            pacman_raw = move
+            self.renderer.move(0, pacman_raw)
+            if game.eat(pacman_raw):
+                tiles[pacman_raw] = 2
+                state['score'] += 1
+                self.renderer.eat(pacman_raw)
+        else:
+            for (i, ghost_move) in enumerate(move):
+                ghosts_raw[i] = ghost_move
+                self.renderer.move(i + 1, ghost_move)
+
+    def tick(self):
+        now = time.perf_counter()
+        if self.future is None:
+            if now - self.turn_start >= turn_time / 1000:
+                self.turn_start = now
+                self.search(True)
+        elif self.future.done() or now >= self.started + self.wait:
+            if self.future.done():
+                move = self.future.result()
+            else:
+                # the late result is dropped, the search ends on its own budget
+                move = self.fallback()
+                self.misses += 1
+            self.future = None
+            self.latencies.append(now - self.started)
+            was_pacman = self.is_pacman
+            self.play(move)
+            if was_pacman and not is_end():
+                self.search(False)
+
+        self.renderer.flush()
+        if is_end() and self.future is None:
+            self.executor.shutdown(wait=False)
+            self.report()
+            return
+        ontimer(self.tick, tick_time)
+
+    def report(self):
+        print(self.renderer.report())
+        latencies = sorted(self.latencies)
+        print(f"{len(latencies)} moves, median {latencies[len(latencies) // 2] * 1000:.1f} ms, "
+              f"max {latencies[-1] * 1000:.1f} ms until played, {self.misses} deadlines missed")
 
 
 def play():
-    global pacman_raw
-    minimax = Minimax(tiles)
-    while not is_end():
-        tiles[pacman_raw] = 2
-        pacman_move = minimax.find_best_move(tiles, pacman_raw, ghosts_raw, True)
-        agent_move(pacman_raw, pacman_move, True)
-        pacman_raw = pacman_move
-
-        for i, ghost_move in enumerate(minimax.find_best_move(tiles, pacman_raw, ghosts_raw, False)):
-            agent_move(ghosts_raw[i], ghost_move, False)
-            ghosts_raw[i] = ghost_move
-
-        if pacman_raw in ghosts_raw:
-            break
-        time.sleep(0.3)
-
-
-setup(420, 420, 370, 0)
+    global game
+    # the default depth finishes well within think_time on this maze, max_turns ends a game that still stalls
+    minimax = Minimax(tiles, width=width)
+    # coins numbered and keyed the way the agent hashes its positions
+    game = minimax.new_state(tiles)
+    # the fallback moves read the tables while a search runs, build them all now
+    minimax.g.build_rings()
+
+    renderer = Renderer(['yellow'] + ['red'] * len(ghosts_raw))
+    tiles[pacman_raw] = 2
+    if game.eat(pacman_raw):
+        renderer.eat(pacman_raw)
+    for (agent, index) in enumerate([pacman_raw] + ghosts_raw):
+        renderer.move(agent, index)
+    GameLoop(minimax, renderer).start()
+
+
+setup(width * 20 + 20, len(tiles) // width * 20 + 20, 370, 0)
 hideturtle()
 tracer(False)
-writer.goto(160, 160)
+writer.goto(width * 10 - 40, len(tiles) // width * 10 - 40)
 writer.color('white')
 writer.write(state['score'])
 world()
-play()
\ No newline at end of file
+play()
+done()
\ No newline at end of file
@@ -0,0 +1,146 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import graph
+import maze
+import simulator
+from minimax import Minimax
+
+# agent of the worker process, built once by init_worker
+_minimax = None
+
+
+def init_worker(tiles, depth, tt_path=None, width=20):
+    """
+    Build the worker's agent, its graph and distance tables once for all its games
+    :param tiles: maze
+    :param depth: search depth of the agents
+    :param tt_path: disk transposition table shared read-only by the workers
+    :param width: row length of the maze
+    """
+    global _minimax
+    _minimax = Minimax(tiles[:], depth=depth, tt_path=tt_path, preload=tt_path is not None, width=width)
+    _minimax.g.build_rings()
+
+
+def play_shard(seeds, kwargs):
+    """
+    Play a shard of games in the worker
+    :param seeds: seeds of the games
+    :param kwargs: passed to simulator.play_game
+    :return: list of game results
+    """
+    return [simulator.play_game(_minimax, seed, **kwargs) for seed in seeds]
+
+
+def run_parallel(games, seed=0, workers=None, tiles=None, depth=4, shard_size=10, tt_path=None, width=20,
+                 **kwargs):
+    """
+    Play seeded games across worker processes, game i uses seed + i
+    Every game clears the agent's transposition table first, so its outcome only depends on its seed
+    and the results are the same for any number of workers
+    :param games: number of games
+    :param seed: seed of the first game
+    :param workers: number of processes, os.cpu_count() when None
+    :param tiles: maze, the built-in one when None
+    :param depth: search depth of the agents
+    :param shard_size: games sent to a worker at once
+    :param tt_path: disk transposition table written by Minimax.save_table, None searches cold
+    :param width: row length of the maze
+    :param kwargs: passed to simulator.play_game
+    :return: list of game results ordered by seed
+    """
+    tiles = graph.tiles if tiles is None else tiles
+    seeds = range(seed, seed + games)
+    shards = [seeds[i:i + shard_size] for i in range(0, games, shard_size)]
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(tiles, depth, tt_path, width)) as executor:
+        futures = [executor.submit(play_shard, shard, kwargs) for shard in shards]
+        # results stream back as shards finish, in whatever order that is
+        for future in as_completed(futures):
+            results += future.result()
+
+    results.sort(key=lambda result: result['seed'])
+    return results
+
+
+def outcomes(results):
+    """
+    :param results: list of game results
+    :return: the fields of every game that do not depend on timing
+    """
+    return [(result['seed'], result['result'], result['steps'], result['score']) for result in results]
+
+
+def scaling(games, max_workers=None, seed=0, **kwargs):
+    """
+    Measure the scaling efficiency of run_parallel from 1 to max_workers processes
+    :param games: number of games per run
+    :param max_workers: largest number of processes, os.cpu_count() when None
+    :param seed: seed of the first game
+    :param kwargs: passed to run_parallel
+    """
+    max_workers = max_workers or os.cpu_count()
+    counts = sorted({1, max_workers} | {2 ** i for i in range(max_workers.bit_length()) if 2 ** i <= max_workers})
+
+    baseline = None
+    for workers in counts:
+        start = time.perf_counter()
+        results = run_parallel(games, seed, workers, **kwargs)
+        elapsed = time.perf_counter() - start
+
+        if baseline is None:
+            baseline = (elapsed, outcomes(results))
+        same = outcomes(results) == baseline[1]
+        efficiency = baseline[0] / (elapsed * workers)
+
+        print(f"{workers} workers: {elapsed:.2f} s, {games / elapsed:.1f} games/s, "
+              f"speedup {baseline[0] / elapsed:.2f}, efficiency {efficiency:.0%}, "
+              f"{'same' if same else 'DIFFERENT'} results")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Play Pacman games without rendering on all cores")
+    parser.add_argument('--games', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--ghosts', type=int, default=1)
+    parser.add_argument('--depth', type=int, default=4)
+    parser.add_argument('--max-steps', type=int, default=300)
+    parser.add_argument('--format', choices=['csv', 'json'], default='json')
+    parser.add_argument('--output', default=None, help="file to write, stdout by default")
+    parser.add_argument('--table', default=None, help="disk transposition table to probe")
+    parser.add_argument('--scaling', action='store_true', help="report scaling efficiency from 1 to --workers cores")
+    parser.add_argument('--width', type=int, default=None, help="play on a generated maze of this row length")
+    parser.add_argument('--height', type=int, default=None, help="rows of the generated maze, --width by default")
+    parser.add_argument('--maze-seed', type=int, default=0)
+    args = parser.parse_args()
+
+    tiles, width = None, 20
+    if args.width is not None:
+        width = args.width
+        tiles = maze.generate(width, args.height or width, args.maze_seed)
+
+    if args.scaling:
+        scaling(args.games, args.workers, args.seed, tiles=tiles, width=width, depth=args.depth, tt_path=args.table,
+                num_ghosts=args.ghosts, max_steps=args.max_steps)
+        sys.exit()
+
+    start = time.perf_counter()
+    results = run_parallel(args.games, args.seed, args.workers, tiles, depth=args.depth, tt_path=args.table,
+                           width=width, num_ghosts=args.ghosts, max_steps=args.max_steps)
+    elapsed = time.perf_counter() - start
+
+    out = sys.stdout if args.output is None else open(args.output, 'w', newline='')
+    if args.format == 'csv':
+        simulator.write_csv(results, out)
+    else:
+        simulator.write_json(results, out)
+    if out is not sys.stdout:
+        out.close()
+
+    print(f"{args.games} games in {elapsed:.1f} s ({args.games / elapsed:.1f} games/s)", file=sys.stderr)
@@ -0,0 +1,190 @@
+import argparse
+import csv
+import json
+import random
+import statistics
+import sys
+import time
+
+import graph
+import maze
+from minimax import Minimax
+
+FIELDS = ['seed', 'result', 'steps', 'score', 'coins_left', 'mean_move_ms', 'max_move_ms']
+
+
+def random_init(tiles, rng):
+    """
+    Random spawn the same way pacman.random_init picks it: a random tile, moved forward to the next coin
+    :param tiles: maze
+    :param rng: random.Random
+    :return: tile index
+    """
+    raw_pos = rng.randint(0, len(tiles) - 1)
+    while tiles[raw_pos] != 1:
+        raw_pos = (raw_pos + 1) % len(tiles)
+    return raw_pos
+
+
+def play_game(minimax, seed, num_ghosts=1, max_steps=300, budget=None, record=False, ghost_agent=None):
+    """
+    Play one game without any rendering
+    :param minimax: agent, reused between games on the same maze
+    :param seed: random seed for the spawns
+    :param num_ghosts: number of ghosts
+    :param max_steps: turns before the game is called a draw
+    :param budget: time budget per move in milliseconds, None searches to minimax.depth
+    :param record: also return the positions after every turn as 'trajectory', a list of (pacman, ghosts)
+    :param ghost_agent: agent moving the ghosts, minimax when None; any agent with find_best_move and reset
+    :return: dict with the FIELDS of the game
+    """
+    tiles = minimax.tiles[:]
+    rng = random.Random(seed)
+    ghost_agent = minimax if ghost_agent is None else ghost_agent
+    # a game must not depend on the games played before it by the same agent
+    minimax.reset()
+    ghost_agent.reset()
+
+    pacman = random_init(tiles, rng)
+    ghosts = []
+    for _ in range(num_ghosts):
+        ghost = random_init(tiles, rng)
+        while ghost == pacman:  # reinit in case of collision
+            ghost = random_init(tiles, rng)
+        ghosts.append(ghost)
+
+    state = minimax.new_state(tiles)
+    tiles[pacman] = 2
+    state.eat(pacman)
+
+    score = 0
+    steps = 0
+    result = 'draw'
+    latencies = []
+    trajectory = [(pacman, tuple(ghosts))]
+
+    while steps < max_steps:
+        steps += 1
+        start = time.perf_counter()
+        pacman = minimax.find_best_move(tiles, pacman, ghosts, True, budget, state)
+        latencies.append(time.perf_counter() - start)
+
+        if state.eat(pacman):
+            tiles[pacman] = 2
+            score += 1
+        if pacman in ghosts:
+            result = 'loss'
+            break
+        if not state.count:
+            result = 'win'
+            break
+
+        start = time.perf_counter()
+        ghosts = ghost_agent.find_best_move(tiles, pacman, ghosts, False, budget, state)
+        latencies.append(time.perf_counter() - start)
+        trajectory.append((pacman, tuple(ghosts)))
+
+        if pacman in ghosts:
+            result = 'loss'
+            break
+
+    game = {
+        'seed': seed,
+        'result': result,
+        'steps': steps,
+        'score': score,
+        'coins_left': state.count,
+        'mean_move_ms': statistics.mean(latencies) * 1000,
+        'max_move_ms': max(latencies) * 1000,
+    }
+    if record:
+        game['trajectory'] = trajectory
+    return game
+
+
+def run_games(games, seed=0, tiles=None, depth=4, width=20, **kwargs):
+    """
+    Play seeded games one after another, game i uses seed + i
+    :param games: number of games
+    :param seed: seed of the first game
+    :param tiles: maze, the built-in one when None
+    :param depth: search depth of the agents
+    :param width: row length of the maze
+    :param kwargs: passed to play_game
+    :return: list of game results
+    """
+    minimax = Minimax((graph.tiles if tiles is None else tiles)[:], depth=depth, width=width)
+    return [play_game(minimax, seed + i, **kwargs) for i in range(games)]
+
+
+def summarize(results):
+    """
+    Aggregate game results
+    :param results: list of game results
+    :return: dict with win rate, mean steps and score and move latency percentiles
+    """
+    latencies = sorted(result['mean_move_ms'] for result in results)
+    return {
+        'games': len(results),
+        'win_rate': sum(result['result'] == 'win' for result in results) / len(results),
+        'loss_rate': sum(result['result'] == 'loss' for result in results) / len(results),
+        'mean_steps': statistics.mean(result['steps'] for result in results),
+        'mean_score': statistics.mean(result['score'] for result in results),
+        'p50_move_ms': latencies[len(latencies) // 2],
+        'p95_move_ms': latencies[int(len(latencies) * 0.95)],
+        'max_move_ms': max(result['max_move_ms'] for result in results),
+    }
+
+
+def write_csv(results, out):
+    """
+    :param results: list of game results
+    :param out: text file
+    """
+    writer = csv.DictWriter(out, fieldnames=FIELDS)
+    writer.writeheader()
+    writer.writerows(results)
+
+
+def write_json(results, out):
+    """
+    :param results: list of game results
+    :param out: text file
+    """
+    json.dump({'summary': summarize(results), 'games': results}, out, indent=2)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Play Pacman games without rendering")
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--ghosts', type=int, default=1)
+    parser.add_argument('--depth', type=int, default=4)
+    parser.add_argument('--max-steps', type=int, default=300)
+    parser.add_argument('--budget', type=float, default=None, help="milliseconds per move")
+    parser.add_argument('--format', choices=['csv', 'json'], default='json')
+    parser.add_argument('--output', default=None, help="file to write, stdout by default")
+    parser.add_argument('--width', type=int, default=None, help="play on a generated maze of this row length")
+    parser.add_argument('--height', type=int, default=None, help="rows of the generated maze, --width by default")
+    parser.add_argument('--maze-seed', type=int, default=0)
+    args = parser.parse_args()
+
+    tiles, width = None, 20
+    if args.width is not None:
+        width = args.width
+        tiles = maze.generate(width, args.height or width, args.maze_seed)
+
+    start = time.perf_counter()
+    results = run_games(args.games, args.seed, tiles, args.depth, width, num_ghosts=args.ghosts,
+                        max_steps=args.max_steps, budget=args.budget)
+    elapsed = time.perf_counter() - start
+
+    out = sys.stdout if args.output is None else open(args.output, 'w', newline='')
+    if args.format == 'csv':
+        write_csv(results, out)
+    else:
+        write_json(results, out)
+    if out is not sys.stdout:
+        out.close()
+
+    print(f"{args.games} games in {elapsed:.1f} s ({args.games / elapsed:.1f} games/s)", file=sys.stderr)
@@ -0,0 +1,193 @@
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+import graph
+from maze import random_grid
+from minimax import Minimax
+
+SEARCHES = ['BFS', 'DFS', 'UCS', 'Greedy', 'AStar']
+
+
+def percentile(values, q):
+    """
+    :param values: sorted list
+    :param q: percentile between 0 and 100
+    :return: nearest-rank percentile
+    """
+    return values[min(len(values) - 1, int(len(values) * q / 100))]
+
+
+def measure(calls, counter, setup=None, repeat=5):
+    """
+    Time every call on its own, keeping its fastest of repeat runs, then run them once more under tracemalloc
+    for the peak memory
+    :param calls: list of functions without arguments
+    :param counter: function returning the expanded node count of the last call
+    :param setup: function run before every call, outside of the timing and the memory tracing
+    :param repeat: timed runs of every call
+    :return: dict with ops/sec, latency percentiles in milliseconds, mean expanded nodes and peak memory in KiB
+    """
+    setup = setup or (lambda: None)
+    latencies = [float('inf')] * len(calls)
+    expanded = 0
+    for _ in range(repeat):
+        expanded = 0
+        for (i, call) in enumerate(calls):
+            setup()
+            start = time.perf_counter()
+            call()
+            latencies[i] = min(latencies[i], time.perf_counter() - start)
+            expanded += counter()
+
+    peak = 0
+    for call in calls:
+        setup()
+        tracemalloc.start()
+        call()
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        'ops_per_sec': len(calls) / sum(latencies),
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p90_ms': percentile(latencies, 90) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'expanded': expanded / len(calls),
+        'peak_kib': peak / 1024,
+    }
+
+
+def mazes(sizes):
+    """
+    :param sizes: maze widths, the built-in maze is used for 20 and seeded square grids otherwise
+    :return: list of (name, tiles, width)
+    """
+    return [('maze20' if size == 20 else f'grid{size}', graph.tiles if size == 20 else random_grid(size, size), size)
+            for size in sizes]
+
+
+def bench_searches(sizes=(20, 40, 80), queries=100, seed=0):
+    """
+    Run every Graph search on the same seeded (start, target) pairs of every maze
+    :param sizes: maze widths
+    :param queries: pairs per maze
+    :param seed: random seed of the pairs
+    :return: dict of 'maze/search' to its measurements
+    """
+    results = {}
+    for (name, tiles, width) in mazes(sizes):
+        g = graph.Graph(tiles, width)
+        roads = graph.get_roads(tiles)
+        rng = random.Random(seed)
+        pairs = [rng.sample(roads, 2) for _ in range(queries)]
+
+        for search in SEARCHES:
+            method = getattr(g, search)
+            calls = [lambda s=s, t=t: method(s, t) for (s, t) in pairs]
+            results[f'{name}/{search}'] = measure(calls, lambda: g.expanded)
+    return results
+
+
+def bench_minimax(depth=6, positions=20, ghosts=2, seed=0):
+    """
+    Run Minimax.find_best_move for both sides on seeded positions of the built-in maze
+    :param depth: search depth
+    :param positions: number of positions
+    :param ghosts: number of ghosts
+    :param seed: random seed of the positions
+    :return: dict of 'maze20/Minimax-side' to its measurements, expanded counts the searched nodes
+    """
+    minimax = Minimax(graph.tiles[:], depth=depth)
+    roads = graph.get_roads(graph.tiles)
+    rng = random.Random(seed)
+    spawns = [rng.sample(roads, ghosts + 1) for _ in range(positions)]
+
+    results = {}
+    for (side, is_pacman) in (('pacman', True), ('ghosts', False)):
+        calls = [lambda p=pacman, a=agents: minimax.find_best_move(graph.tiles[:], p, a, is_pacman)
+                 for (pacman, *agents) in spawns]
+        # every position is searched from scratch
+        results[f'maze20/Minimax-{side}'] = measure(calls, lambda: minimax.nodes, minimax.reset)
+    return results
+
+
+def run(sizes=(20, 40, 80), queries=100, positions=20, seed=0):
+    """
+    :return: the whole suite's results with the interpreter they were measured on
+    """
+    results = bench_searches(sizes, queries, seed)
+    results.update(bench_minimax(positions=positions, seed=seed))
+    return {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': results,
+    }
+
+
+def regressions(current, baseline, tolerance=0.2):
+    """
+    Compare a run with a baseline
+    Expanded node counts are deterministic and must not grow at all,
+    the median latency and memory may move by the tolerance before they count;
+    the median is used over ops/sec as a single slow outlier query dominates the total
+    :param current: results of run()
+    :param baseline: results of an earlier run()
+    :param tolerance: allowed relative growth of the median latency and the peak memory
+    :return: list of messages, empty when nothing regressed
+    """
+    found = []
+    for (key, old) in baseline['results'].items():
+        new = current['results'].get(key)
+        if new is None:
+            found.append(f"{key}: missing")
+            continue
+        if new['expanded'] > old['expanded']:
+            found.append(f"{key}: {old['expanded']:.1f} -> {new['expanded']:.1f} nodes expanded")
+        if new['p50_ms'] > old['p50_ms'] * (1 + tolerance):
+            found.append(f"{key}: {old['p50_ms']:.3f} -> {new['p50_ms']:.3f} ms median")
+        if new['peak_kib'] > old['peak_kib'] * (1 + tolerance):
+            found.append(f"{key}: {old['peak_kib']:.1f} -> {new['peak_kib']:.1f} KiB peak")
+    return found
+
+
+def print_results(current):
+    """
+    :param current: results of run()
+    """
+    for (key, result) in current['results'].items():
+        print(f"{key:24} {result['ops_per_sec']:10.0f} ops/s  p50 {result['p50_ms']:8.3f} ms  "
+              f"p90 {result['p90_ms']:8.3f} ms  p99 {result['p99_ms']:8.3f} ms  "
+              f"{result['expanded']:8.1f} expanded  {result['peak_kib']:8.1f} KiB")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the Graph searches and Minimax on seeded inputs")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[20, 40, 80])
+    parser.add_argument('--queries', type=int, default=100)
+    parser.add_argument('--positions', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--save', default=None, help="write the results as a JSON baseline")
+    parser.add_argument('--compare', default=None, help="JSON baseline to check for regressions")
+    parser.add_argument('--tolerance', type=float, default=0.3)
+    args = parser.parse_args()
+
+    current = run(args.sizes, args.queries, args.positions, args.seed)
+    print_results(current)
+
+    if args.save:
+        with open(args.save, 'w') as out:
+            json.dump(current, out, indent=2)
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        found = regressions(current, baseline, args.tolerance)
+        for message in found:
+            print(f"REGRESSION {message}", file=sys.stderr)
+        sys.exit(1 if found else 0)
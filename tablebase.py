@@ -0,0 +1,304 @@
+import argparse
+import heapq
+import itertools
+import mmap
+import struct
+import sys
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+import graph
+from transposition import maze_id
+
+# file header: magic, maze id, number of roads, most coins of a position, number of coin sets
+HEADER = struct.Struct('<8sIIII')
+MAGIC = b'PACTB\x00\x00\x01'
+# padding of the road indexes of a coin set with fewer than max_coins coins
+NO_COIN = 0xFFFF
+
+# tables of the maze being solved, set up by _init_solver
+_roads = None
+_neighbours = None
+
+
+def _init_solver(tiles, width):
+    """
+    Build the road numbering and neighbours once per process
+    Roads are numbered in tile order, the same way as the coin bits of Minimax
+    :param tiles: maze
+    :param width: row length
+    """
+    global _roads, _neighbours
+    _roads, _neighbours = roads_and_neighbours(tiles, width)
+
+
+def roads_and_neighbours(tiles, width):
+    """
+    :param tiles: maze
+    :param width: row length
+    :return: (roads, neighbours), neighbours[k] are the road indexes next to road k
+    """
+    roads = [i for (i, tile) in enumerate(tiles) if tile != 0]
+    road_index = {road: k for (k, road) in enumerate(roads)}
+    # every road has edges, whether its coin was eaten or not
+    g = graph.Graph([1 if tile != 0 else 0 for tile in tiles], width)
+    return roads, [[road_index[v] for v in g.graph[road]] for road in roads]
+
+
+def _solve(coins, smaller):
+    """
+    Retrograde analysis of every (pacman, ghost, side to move) with exactly the given coins left
+    Values are plies to the end of the game with perfect play: d > 0 Pacman eats the last coin,
+    d < 0 the ghost catches Pacman, 0 is a draw or a position that cannot come up
+    Positions are finalized in order of distance, so a side that can win takes the fastest win
+    and a side that cannot delays the loss as long as possible
+    :param coins: tuple of road indexes with a coin
+    :param smaller: dict of the solved values with one coin less, keyed by the coin eaten
+    :return: array of 2 * n * n values, Pacman to move at p * n + g, the ghost to move n * n after
+    """
+    neighbours = _neighbours
+    n = len(neighbours)
+    size = n * n
+    coin = bytearray(n)
+    for c in coins:
+        coin[c] = 1
+
+    values = array('h', bytes(4 * size))
+    final = bytearray(2 * size)
+    # unsolved successors, worst outcome so far for the side to move, whether it can draw or win
+    count = array('i', bytes(8 * size))
+    worst = array('i', bytes(8 * size))
+    escape = bytearray(2 * size)
+    queue = []
+
+    def start(state, sign):
+        if not count[state] and not escape[state]:
+            heapq.heappush(queue, (worst[state], state, sign))
+
+    for p in range(n):
+        if coin[p]:
+            continue
+        for g in range(n):
+            if p == g:
+                continue
+            # Pacman to move
+            state = p * n + g
+            for m in neighbours[p]:
+                if m == g:
+                    worst[state] = max(worst[state], 1)
+                elif not coin[m]:
+                    count[state] += 1
+                elif len(coins) == 1:
+                    # the last coin
+                    heapq.heappush(queue, (1, state, 1))
+                    escape[state] = 1
+                else:
+                    # the rest of the game is in the table with one coin less
+                    value = smaller[m][size + m * n + g]
+                    if value > 0:
+                        heapq.heappush(queue, (value + 1, state, 1))
+                    elif value < 0:
+                        worst[state] = max(worst[state], 1 - value)
+                    escape[state] = escape[state] or value >= 0
+            start(state, -1)
+
+            # ghost to move
+            state += size
+            for m in neighbours[g]:
+                if m == p:
+                    heapq.heappush(queue, (1, state, -1))
+                    escape[state] = 1
+                else:
+                    count[state] += 1
+            start(state, 1)
+
+    while queue:
+        distance, state, sign = heapq.heappop(queue)
+        if final[state]:
+            continue
+        final[state] = 1
+        values[state] = sign * distance
+
+        if state < size:
+            # a Pacman move led here, from the ghost's move before it
+            p, g = divmod(state, n)
+            good = sign < 0
+            predecessors = [size + p * n + m for m in neighbours[g] if m != p]
+        else:
+            # a ghost move led here, from Pacman's move before it
+            p, g = divmod(state - size, n)
+            good = sign > 0
+            predecessors = [m * n + g for m in neighbours[p] if m != g and not coin[m]]
+
+        for before in predecessors:
+            if final[before]:
+                continue
+            if good:
+                heapq.heappush(queue, (distance + 1, before, sign))
+                escape[before] = 1
+            else:
+                count[before] -= 1
+                worst[before] = max(worst[before], distance + 1)
+                start(before, sign)
+
+    return values
+
+
+def coin_sets(candidates, max_coins):
+    """
+    :param candidates: road indexes that may hold a coin
+    :param max_coins: most coins of a position
+    :return: lists of coin sets, one list per number of coins from 1 to max_coins
+    """
+    return [list(itertools.combinations(sorted(candidates), k)) for k in range(1, max_coins + 1)]
+
+
+def generate(tiles, path, max_coins=1, candidates=None, workers=1, width=20):
+    """
+    Solve every position with one ghost and at most max_coins coins and write the tables to a file
+    The coin sets of one size only depend on the sets one coin smaller, so each size is solved across processes
+    The work grows with the number of coin sets, C(len(candidates), max_coins)
+    :param tiles: maze
+    :param path: file to write
+    :param max_coins: most coins of a position
+    :param candidates: tiles that may hold a coin, every road when None
+    :param workers: processes solving coin sets in parallel, 1 solves in this process
+    :param width: row length
+    :return: number of coin sets solved
+    """
+    roads, _ = roads_and_neighbours(tiles, width)
+    road_index = {road: k for (k, road) in enumerate(roads)}
+    candidates = range(len(roads)) if candidates is None else [road_index[tile] for tile in candidates]
+
+    solved = {}
+    pool = None if workers == 1 else ProcessPoolExecutor(max_workers=workers, initializer=_init_solver,
+                                                         initargs=(tiles, width))
+    if pool is None:
+        _init_solver(tiles, width)
+    try:
+        for level in coin_sets(candidates, max_coins):
+            smaller = [{c: solved[tuple(o for o in coins if o != c)] for c in coins} if len(coins) > 1 else {}
+                       for coins in level]
+            if pool is None:
+                results = map(_solve, level, smaller)
+            else:
+                results = pool.map(_solve, level, smaller, chunksize=max(1, len(level) // (4 * workers)))
+            solved.update(zip(level, results))
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    with open(path, 'wb') as out:
+        out.write(HEADER.pack(MAGIC, maze_id(tiles), len(roads), max_coins, len(solved)))
+        for coins in solved:
+            out.write(array('H', coins + (NO_COIN,) * (max_coins - len(coins))).tobytes())
+        for values in solved.values():
+            out.write(values.tobytes())
+
+    return len(solved)
+
+
+class Tablebase:
+    """
+    Exact endgame values memory-mapped from a file written by generate
+    Coin sets are the coin bitsets of GameState, so a position is probed without converting it
+    """
+
+    def __init__(self, path, tiles, width=20):
+        """
+        :param path: file path
+        :param tiles: maze being played
+        :param width: row length
+        """
+        with open(path, 'rb') as file:
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, maze, n, self.max_coins, count = HEADER.unpack_from(self.map)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a tablebase")
+        if maze != maze_id(tiles):
+            raise ValueError(f"{path} was written for another maze")
+
+        self.roads, self.neighbours = roads_and_neighbours(tiles, width)
+        self.road_index = {road: k for (k, road) in enumerate(self.roads)}
+        self.size = n * n
+
+        index = array('H')
+        index.frombytes(self.map[HEADER.size:HEADER.size + 2 * self.max_coins * count])
+        start = HEADER.size + len(index) * 2
+        # byte offset of the values of every coin bitset
+        self.offsets = {}
+        for k in range(count):
+            coins = sum(1 << c for c in index[k * self.max_coins:(k + 1) * self.max_coins] if c != NO_COIN)
+            self.offsets[coins] = start + k * 4 * self.size
+        if len(self.map) != start + count * 4 * self.size:
+            raise ValueError(f"{path} is truncated")
+
+    def value(self, coins, pacman, ghost, pacman_to_move=True):
+        """
+        :param coins: coin bitset
+        :param pacman: pacman position
+        :param ghost: ghost position
+        :param pacman_to_move: side to move
+        :return: plies to the end with perfect play, > 0 Pacman wins, < 0 it loses, 0 draw;
+                 None when the coin set is not in the table
+        """
+        offset = self.offsets.get(coins)
+        if offset is None:
+            return None
+        n = len(self.roads)
+        state = self.road_index[pacman] * n + self.road_index[ghost] + (0 if pacman_to_move else self.size)
+        return struct.unpack_from('h', self.map, offset + 2 * state)[0]
+
+    def best_move(self, coins, pacman, ghost, is_pacman):
+        """
+        Perfect move of a decided position: the fastest win, or the longest resistance
+        :param coins: coin bitset
+        :param pacman: pacman position
+        :param ghost: ghost position
+        :param is_pacman: finding the move for Pacman or the ghost
+        :return: tile index, None when the position is not in the table or is a draw
+        """
+        if not self.value(coins, pacman, ghost, is_pacman):
+            return None
+
+        def outcome(move):
+            # value after the move from Pacman's point of view
+            if is_pacman:
+                if move == ghost:
+                    return -1
+                bit = 1 << self.road_index[move]
+                if not coins & bit:
+                    return self.value(coins, move, ghost, False)
+                if coins == bit:
+                    return 1
+                return self.value(coins ^ bit, move, ghost, False)
+            if move == pacman:
+                return -1
+            return self.value(coins, pacman, move, True)
+
+        def rank(value):
+            # a side prefers a fast win to a draw to a slow loss
+            if not is_pacman:
+                value = -value
+            return (2, -value) if value > 0 else (1, 0) if value == 0 else (0, -value)
+
+        position = pacman if is_pacman else ghost
+        moves = [self.roads[m] for m in self.neighbours[self.road_index[position]]]
+        return max(moves, key=lambda move: rank(outcome(move)))
+
+    def close(self):
+        self.map.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Solve the Pacman endgames with one ghost and few coins")
+    parser.add_argument('--coins', type=int, default=1, help="most coins of a position")
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--output', default='tablebase.bin')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    count = generate(graph.tiles, args.output, args.coins, workers=args.workers)
+    elapsed = time.perf_counter() - start
+    print(f"{count} coin sets in {elapsed:.1f} s", file=sys.stderr)
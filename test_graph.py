@@ -0,0 +1,175 @@
+import random
+import unittest
+
+import graph
+import maze
+
+
+class SearchTest(unittest.TestCase):
+
+    def check_path(self, g, path, start, target, length=None):
+        """
+        :param length: number of tiles of a shortest path, None when the search does not promise one
+        """
+        self.assertEqual((path[0], path[-1]), (start, target))
+        self.assertTrue(all(v in g.graph[u] for (u, v) in zip(path, path[1:])))
+        if length is not None:
+            self.assertEqual(len(path), length)
+
+    def test_searches_on_random_grids(self):
+        # every search against UCS on 200 seeded grids
+        for seed in range(200):
+            tiles = maze.random_grid(12, 9, seed=seed)
+            g = graph.Graph(tiles, 12)
+            roads = graph.get_roads(tiles)
+            rng = random.Random(seed)
+            for _ in range(3):
+                start, target = rng.sample(roads, 2)
+                expected = g.UCS(start, target)
+                for search in (g.BFS, g.AStar, g.JPS, g.BiBFS, g.BiAStar):
+                    path = search(start, target)
+                    if expected is None:
+                        self.assertIsNone(path, search.__name__)
+                    else:
+                        self.check_path(g, path, start, target, len(expected))
+                for search in (g.DFS, g.Greedy):
+                    path = search(start, target)
+                    if expected is not None:
+                        self.check_path(g, path, start, target)
+
+    def test_contracted_graph(self):
+        # paths through the corridor-contracted graph are as short as UCS finds, tiles without edges included
+        for seed in range(200):
+            tiles = maze.random_grid(12, 9, seed=seed)
+            g = graph.Graph(tiles, 12)
+            contracted = graph.ContractedGraph(g)
+            roads = graph.get_roads(tiles)
+            rng = random.Random(seed)
+            for _ in range(3):
+                start, target = rng.sample(roads, 2)
+                expected = g.UCS(start, target)
+                path = contracted.path(start, target)
+                if expected is None:
+                    self.assertIsNone(path)
+                else:
+                    self.check_path(g, path, start, target, len(expected))
+
+
+    def test_tables_and_batched_queries(self):
+        tiles = maze.random_grid(10, 10, seed=3)
+        g = graph.Graph(tiles, 10)
+        g.build_tables()
+        roads = graph.get_roads(tiles)
+        for source in roads[::7]:
+            distances, next_hops = g.multi_target(source, roads)
+            to_source, hops_to_source = g.multi_source(roads, source)
+            for (k, target) in enumerate(roads):
+                expected = g.UCS(target, source)
+                if expected is None:
+                    self.assertEqual(distances[k], -1)
+                    self.assertEqual(to_source[k], -1)
+                    continue
+                self.assertEqual(distances[k], len(expected) - 1)
+                self.assertEqual(to_source[k], len(expected) - 1)
+                self.assertEqual(g.distance(target, source), len(expected) - 1)
+                if target != source:
+                    self.assertEqual(g.distance(g.next_step(target, source), source), len(expected) - 2)
+                    self.assertEqual(g.distance(next_hops[k], target), len(expected) - 2)
+                    self.assertEqual(g.distance(hops_to_source[k], source), len(expected) - 2)
+
+    def test_flow_field(self):
+        # the field is expanded lazily and re-pointed without clearing, its answers must not go stale
+        tiles = maze.random_grid(10, 10, seed=3)
+        g = graph.Graph(tiles, 10)
+        field = graph.FlowField(g)
+        roads = graph.get_roads(tiles)
+        for target in roads[::7]:
+            field.update(target)
+            for source in roads:
+                expected = g.UCS(source, target)
+                if expected is None:
+                    self.assertIsNone(field.distance(source))
+                    self.assertIsNone(field.next_step(source))
+                    continue
+                self.assertEqual(field.distance(source), len(expected) - 1)
+                if source != target:
+                    self.assertIn(field.next_step(source), g.graph[source])
+                    self.assertEqual(field.distance(field.next_step(source)), len(expected) - 2)
+
+
+    def test_queries_without_tables(self):
+        # above table_limit the queries walk BFS fields and must agree with the tables
+        for seed in range(5):
+            tiles = maze.random_grid(12, 9, seed=seed)
+            tables = graph.Graph(tiles, 12)
+            fields = graph.Graph(tiles, 12)
+            fields.table_limit = 0
+            fields.field_cache = 3
+            fields.build_rings()
+            self.assertIsNone(fields.dist_table)
+            roads = graph.get_roads(tiles)
+            rng = random.Random(seed)
+            for u in roads:
+                mask = rng.getrandbits(len(roads)) & rng.getrandbits(len(roads))
+                self.assertEqual(fields.nearest(u, mask), tables.nearest(u, mask))
+                for v in rng.sample(roads, 5):
+                    dist = tables.distance(u, v)
+                    self.assertEqual(fields.distance(u, v), dist)
+                    self.assertEqual(fields.distance(u, v, 3), 3 if dist is None else min(dist, 3))
+                    self.assertEqual(tables.distance(u, v, 3), fields.distance(u, v, 3))
+                    step = fields.next_step(u, v)
+                    if dist is None:
+                        self.assertIsNone(step)
+                    elif u != v:
+                        self.assertEqual(tables.distance(step, v), dist - 1)
+                        self.assertIn(step, fields.graph[u])
+
+    def test_width(self):
+        # no edge wraps around a row, whatever the width
+        for (width, height) in ((9, 7), (20, 5), (31, 11)):
+            tiles = maze.generate(width, height, seed=width)
+            g = graph.Graph(tiles, width)
+            m = maze.Maze(tiles, width)
+            for u in graph.get_roads(tiles):
+                self.assertEqual(g.graph[u], list(m.neighbours(u)))
+                for v in g.graph[u]:
+                    self.assertEqual(abs(u % width - v % width) + abs(u // width - v // width), 1)
+
+
+class DStarLiteTest(unittest.TestCase):
+
+    def check_moving(self, repair_goal):
+        # random walks of both ends with jumps of the goal, every path must be as short as UCS finds
+        for seed in range(30):
+            tiles = maze.random_grid(15, 15, seed=seed)
+            g = graph.Graph(tiles, 15)
+            roads = graph.get_roads(tiles)
+            rng = random.Random(seed)
+            start, goal = rng.sample(roads, 2)
+            planner = graph.DStarLite(g, start, goal, repair_goal)
+            for _ in range(30):
+                r = rng.random()
+                if r < 0.4 and g.graph[start]:
+                    start = rng.choice(g.graph[start])
+                elif r < 0.8 and g.graph[goal]:
+                    goal = rng.choice(g.graph[goal])
+                else:
+                    goal = rng.choice(roads)
+                path = planner.replan(start, goal)
+                expected = g.UCS(start, goal)
+                if expected is None:
+                    self.assertIsNone(path)
+                    continue
+                self.assertEqual(len(path), len(expected))
+                self.assertEqual((path[0], path[-1]), (start, goal))
+                self.assertTrue(all(v in g.graph[u] for (u, v) in zip(path, path[1:])))
+
+    def test_restart_on_goal_moves(self):
+        self.check_moving(False)
+
+    def test_repair_goal_moves(self):
+        self.check_moving(True)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,23 @@
+import unittest
+
+import graph
+from mcts import MCTS
+
+
+class MCTSTest(unittest.TestCase):
+
+    def test_eaten_tiles_stay_roads(self):
+        # the agent is built, and its workers started, after the game has already changed the tiles
+        neighbours = graph.Graph(graph.tiles).graph[103]
+        tiles = graph.tiles[:]
+        tiles[103] = 2
+        self.assertIn(MCTS(tiles, iterations=200).find_best_move(tiles, 103, [22], True), neighbours)
+        parallel = MCTS(tiles, iterations=200, workers=2)
+        try:
+            self.assertIn(parallel.find_best_move(tiles, 103, [22], True), neighbours)
+        finally:
+            parallel.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+
+import graph
+import simulator
+from minimax import DECIDED, WIN, Minimax
+
+
+class MinimaxTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.minimax = Minimax(graph.tiles[:])
+
+    def test_capture_before_last_coin(self):
+        # eating the last coin on a ghost's tile loses, as in simulator.play_game
+        state = self.minimax.new_state([tile if i == 21 else 0 for (i, tile) in enumerate(graph.tiles)])
+        state.eat(21)
+        self.assertEqual(self.minimax.evaluate(state, 21, (21,)), -WIN)
+        self.assertEqual(self.minimax.evaluate(state, 21, (22,)), WIN)
+
+    def test_sooner_win_scores_higher(self):
+        state = self.minimax.new_state([0] * len(graph.tiles))
+        self.assertGreater(self.minimax.evaluate(state, 21, (22,), 1), self.minimax.evaluate(state, 21, (22,), 3))
+        self.assertLess(self.minimax.evaluate(state, 21, (21,), 1), self.minimax.evaluate(state, 21, (21,), 3))
+
+    def test_ghosts_stay_once_pacman_is_caught(self):
+        state = self.minimax.new_state(graph.tiles)
+        self.assertEqual(self.minimax.find_best_move(graph.tiles, 22, [21, 342], False, state=state), [22, 342])
+
+    def test_decided_root_stays(self):
+        # a position that is already won or lost has no move to search, the agent keeps its tile
+        state = self.minimax.new_state([0] * len(graph.tiles))
+        self.assertEqual(self.minimax.find_best_move(graph.tiles, 21, [342], True, state=state), 21)
+        state = self.minimax.new_state(graph.tiles)
+        self.assertEqual(self.minimax.find_best_move(graph.tiles, 21, [21], True, state=state), 21)
+
+    def test_unreachable_coins(self):
+        # two rooms without a door between them, the coins of the other room can never be eaten
+        tiles = [0] * 7 + [0, 1, 1, 0, 1, 1, 0] * 2 + [0] * 7
+        for seed in range(3):
+            game = simulator.play_game(Minimax(tiles[:], depth=6, width=7), seed, max_steps=20)
+            self.assertIn(game['result'], ('draw', 'loss'))
+
+    def test_history_stays_out_of_the_table(self):
+        # the cost of repeating a position depends on the game so far, stored values must not carry it
+        minimax = Minimax(graph.tiles[:], depth=6)
+        state = minimax.new_state(graph.tiles)
+        state.eat(104)
+        for move in minimax.g.graph[22]:
+            minimax.played[minimax.zobrist.key(state.key, 104, (move,), 0)] = 10 ** 6
+        minimax.find_best_move(graph.tiles, 104, [22], False, state=state)
+        values = [slot[1][1] for slot in minimax.tt.slots if slot is not None]
+        self.assertTrue(values)
+        self.assertTrue(all(abs(value) < 10 ** 6 or abs(value) >= DECIDED for value in values))
+
+    def test_default_depth_game_finishes(self):
+        # a deep search must not put eating off or shuffle back and forth until the step cap
+        game = simulator.play_game(self.minimax, 0, max_steps=1000)
+        self.assertEqual(game['result'], 'win')
+
+    def test_parallel_search_after_eating(self):
+        # the workers start once the game has already changed the tiles
+        tiles = graph.tiles[:]
+        parallel = Minimax(tiles, depth=6, workers=2)
+        tiles[103] = 2
+        state = parallel.new_state(tiles)
+        try:
+            self.assertEqual(parallel.find_best_move(tiles, 104, [22], True, state=state),
+                             Minimax(tiles, depth=6).find_best_move(tiles, 104, [22], True, state=state))
+        finally:
+            parallel.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
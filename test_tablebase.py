@@ -0,0 +1,68 @@
+import os
+import tempfile
+import unittest
+
+import maze
+import tablebase
+
+
+class TablebaseTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.width = 7
+        cls.tiles = maze.generate(cls.width, 7, seed=1, loops=0.5)
+        cls.directory = tempfile.TemporaryDirectory()
+        path = os.path.join(cls.directory.name, 'tablebase.bin')
+        tablebase.generate(cls.tiles, path, max_coins=2, width=cls.width)
+        cls.table = tablebase.Tablebase(path, cls.tiles, cls.width)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.table.close()
+        cls.directory.cleanup()
+
+    def outcome(self, coins, pacman, ghost, is_pacman, move):
+        """
+        :return: value after the move from Pacman's point of view, as the game rules score it
+        """
+        table = self.table
+        if is_pacman:
+            if move == ghost:
+                return -1
+            bit = 1 << table.road_index[move]
+            if coins == bit:
+                return 1
+            value = table.value(coins & ~bit, move, ghost, False)
+        else:
+            if move == pacman:
+                return -1
+            value = table.value(coins, pacman, move, True)
+        return value + 1 if value > 0 else value - 1 if value < 0 else 0
+
+    def test_values_satisfy_the_game_rules(self):
+        # every value is the best outcome over the moves: the fastest win, else a draw, else the slowest loss
+        table = self.table
+        n = len(table.roads)
+        for (coins, _) in table.offsets.items():
+            for p in range(n):
+                if coins >> p & 1:
+                    continue
+                for g in range(n):
+                    if p == g:
+                        continue
+                    pacman, ghost = table.roads[p], table.roads[g]
+                    for is_pacman in (True, False):
+                        position = pacman if is_pacman else ghost
+                        values = [self.outcome(coins, pacman, ghost, is_pacman, table.roads[m])
+                                  for m in table.neighbours[table.road_index[position]]]
+
+                        def rank(value):
+                            value = value if is_pacman else -value
+                            return (2, -value) if value > 0 else (1, 0) if value == 0 else (0, -value)
+
+                        self.assertEqual(table.value(coins, pacman, ghost, is_pacman), max(values, key=rank))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import os
+import tempfile
+import unittest
+
+import graph
+from minimax import CoinBits, GameState
+from transposition import DiskTable, TranspositionTable, Zobrist, maze_id
+
+
+class ZobristTest(unittest.TestCase):
+
+    def test_coin_key_follows_eaten_coins(self):
+        roads = graph.get_roads(graph.tiles)
+        zobrist = Zobrist(roads)
+        state = GameState(graph.tiles, CoinBits({road: k for (k, road) in enumerate(roads)}), zobrist.coin)
+        for road in roads[::3]:
+            state.eat(road)
+        state.uneat(roads[0])
+        left = [road for road in roads if state.has_coin(road)]
+        expected = 0
+        for road in left:
+            expected ^= zobrist.coin[road]
+        self.assertEqual(state.key, expected)
+        self.assertEqual(state.key, GameState([1 if i in left else 0 for i in range(len(graph.tiles))],
+                                              state.coin_bit, zobrist.coin).key)
+
+    def test_keys_depend_on_the_seed_only(self):
+        roads = graph.get_roads(graph.tiles)
+        self.assertEqual(Zobrist(roads).key(0, 21, (22, 23), 1), Zobrist(roads).key(0, 21, (22, 23), 1))
+        self.assertNotEqual(Zobrist(roads).key(0, 21, (22,), 1), Zobrist(roads).key(0, 21, (22,), 0))
+        self.assertNotEqual(Zobrist(roads).key(0, 21, (22,), 1), Zobrist(roads, 1).key(0, 21, (22,), 1))
+
+
+class TranspositionTableTest(unittest.TestCase):
+
+    def test_bucket_keeps_deep_and_newest_entries(self):
+        table = TranspositionTable(2)
+        table.store(5, (8, 1.0, 0, 21))
+        table.store(7, (2, 2.0, 0, 22))
+        # same bucket: the shallow entry takes the always-replace slot
+        self.assertEqual(table.probe(5), (8, 1.0, 0, 21))
+        self.assertEqual(table.probe(7), (2, 2.0, 0, 22))
+        table.store(9, (3, 3.0, 0, 23))
+        self.assertIsNone(table.probe(7))
+        self.assertEqual(table.probe(5), (8, 1.0, 0, 21))
+        # entries of an earlier search give way to shallower new ones
+        table.new_search()
+        table.store(11, (1, 4.0, 0, 24))
+        self.assertEqual(table.probe(11), (1, 4.0, 0, 24))
+        self.assertEqual(table.probe(5), (8, 1.0, 0, 21))
+
+    def test_disk_table_round_trip(self):
+        table = TranspositionTable(64)
+        entries = {key * 7919: (key % 5, key / 3, key % 3, None if key % 4 else key) for key in range(1, 20)}
+        for (key, entry) in entries.items():
+            table.store(key, entry)
+        maze = maze_id(graph.tiles)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'table.bin')
+            table.save(path, maze)
+            disk = DiskTable(path, maze, preload=True)
+            try:
+                for key in entries:
+                    self.assertEqual(disk.probe(key), table.probe(key))
+                self.assertIsNone(disk.probe(12345))
+            finally:
+                disk.close()
+            with self.assertRaises(ValueError):
+                DiskTable(path, maze ^ 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
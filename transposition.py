@@ -0,0 +1,236 @@
+import mmap
+import random
+import struct
+import zlib
+
+# file header: magic, maze id, Zobrist seed, number of slots
+HEADER = struct.Struct('<8sIIQ')
+MAGIC = b'PACTT\x00\x00\x01'
+# slot: key, value, best move (-1 for None), depth, bound flag; key 0 marks an empty slot
+RECORD = struct.Struct('<QdiHBx')
+
+
+def maze_id(tiles):
+    """
+    Identify the walls of a maze, a disk table is only valid for the maze it was written for
+    :param tiles: maze
+    :return: crc32 of the wall layout
+    """
+    return zlib.crc32(bytes(tile != 0 for tile in tiles))
+
+
+class Zobrist:
+    """
+    Zobrist keys of (pacman, ghosts, coin set, side to move)
+    Every feature gets a random 64-bit key and a position is the xor of the keys of its features
+    Keys only depend on the seed, so every process hashes the same position to the same key
+    """
+
+    def __init__(self, roads, seed=0):
+        """
+        :param roads: tiles agents can stand on
+        :param seed: random seed of the keys
+        """
+        self.roads = roads
+        self.seed = seed
+        self.coin = self.table('coin')
+        self.pacman = self.table('pacman')
+        # ghost and side keys are made on demand, one table per ghost slot
+        self.ghost = []
+        self.side = []
+
+    def table(self, name):
+        """
+        :param name: feature name, seeds the keys together with self.seed
+        :return: dict of a random 64-bit key per road
+        """
+        rng = random.Random(f'{self.seed}-{name}')
+        return {road: rng.getrandbits(64) for road in self.roads}
+
+    def key(self, coin_key, pacman, ghosts, agent):
+        """
+        :param coin_key: xor of the coin keys of the coins left, as kept by GameState
+        :param pacman: pacman position
+        :param ghosts: tuple of ghosts positions
+        :param agent: agent to move
+        :return: 64-bit key of the position
+        """
+        # tables for every ghost and side to move, so the search can update the key move by move
+        while len(self.ghost) < len(ghosts):
+            self.ghost.append(self.table(f'ghost{len(self.ghost)}'))
+        while len(self.side) <= len(ghosts):
+            self.side.append(random.Random(f'{self.seed}-side{len(self.side)}').getrandbits(64))
+
+        key = coin_key ^ self.pacman[pacman] ^ self.side[agent]
+        for (table, ghost) in zip(self.ghost, ghosts):
+            key ^= table[ghost]
+        return key
+
+
+class TranspositionTable:
+    """
+    Bounded transposition table in buckets of two slots
+    The first slot keeps the deepest entry of the current search, the second one always takes the newest entry
+    Probe and store counts are kept so the table can be sized
+    """
+
+    def __init__(self, size):
+        """
+        :param size: number of slots, rounded up to an even number
+        """
+        self.size = size + size % 2
+        self.slots = [None] * self.size
+        self.generation = 0
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+        self.replaced = 0
+
+    def __len__(self):
+        return self.size - self.slots.count(None)
+
+    def bucket(self, key):
+        """
+        :param key: position key
+        :return: index of the first slot of the key's bucket
+        """
+        return key % (self.size // 2) * 2
+
+    def probe(self, key):
+        """
+        :param key: position key
+        :return: (depth, value, flag, move) or None
+        """
+        self.probes += 1
+        i = self.bucket(key)
+        slot = self.slots[i]
+        if slot is None or slot[0] != key:
+            slot = self.slots[i + 1]
+            if slot is None or slot[0] != key:
+                return None
+        self.hits += 1
+        return slot[1]
+
+    def store(self, key, entry):
+        """
+        Store an entry, replacing a shallower or older one
+        :param key: position key
+        :param entry: (depth, value, flag, move)
+        """
+        self.stores += 1
+        i = self.bucket(key)
+        first = self.slots[i]
+        if first is None or first[0] == key or entry[0] >= first[1][0] or first[2] != self.generation:
+            if first is not None and first[0] != key:
+                # the deep entry it pushes out still gets the always-replace slot
+                self.replace(i + 1, first)
+            self.replace(i, (key, entry, self.generation))
+        else:
+            self.replace(i + 1, (key, entry, self.generation))
+
+    def replace(self, i, slot):
+        """
+        :param i: slot index
+        :param slot: (key, entry, generation)
+        """
+        old = self.slots[i]
+        if old is not None and old[0] != slot[0]:
+            self.replaced += 1
+        self.slots[i] = slot
+
+    def new_search(self):
+        """
+        Age the entries, deep entries of earlier searches can be replaced by shallower new ones
+        """
+        self.generation += 1
+
+    def clear(self):
+        """
+        Drop every entry and reset the counters
+        """
+        self.slots = [None] * self.size
+        self.probes = self.hits = self.stores = self.replaced = 0
+
+    def hit_rate(self):
+        """
+        :return: share of probes that found their key
+        """
+        return self.hits / self.probes if self.probes else 0.0
+
+    def save(self, path, maze, seed=0):
+        """
+        Write the table to a file that DiskTable can map
+        :param path: file path
+        :param maze: maze_id of the maze the entries belong to
+        :param seed: Zobrist seed of the keys
+        """
+        empty = RECORD.pack(0, 0.0, -1, 0, 0)
+        with open(path, 'wb') as out:
+            out.write(HEADER.pack(MAGIC, maze, seed, self.size))
+            for slot in self.slots:
+                if slot is None:
+                    out.write(empty)
+                    continue
+                key, (depth, value, flag, move), _ = slot
+                out.write(RECORD.pack(key, value, -1 if move is None else move, depth, flag))
+
+
+class DiskTable:
+    """
+    Read-only transposition table memory-mapped from a file written by TranspositionTable.save
+    Processes mapping the same file share its pages through the page cache
+    """
+
+    def __init__(self, path, maze, seed=0, preload=False):
+        """
+        :param path: file path
+        :param maze: maze_id of the maze being searched
+        :param seed: Zobrist seed of the keys
+        :param preload: read the whole file into the page cache now instead of on the first probes
+        """
+        with open(path, 'rb') as file:
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, file_maze, file_seed, self.size = HEADER.unpack_from(self.map)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a transposition table")
+        if (file_maze, file_seed) != (maze, seed):
+            raise ValueError(f"{path} was written for another maze or Zobrist seed")
+        if len(self.map) != HEADER.size + self.size * RECORD.size:
+            raise ValueError(f"{path} is truncated")
+
+        self.probes = 0
+        self.hits = 0
+        if preload:
+            self.preload()
+
+    def preload(self):
+        """
+        Fault every page of the table in
+        """
+        if hasattr(mmap, 'MADV_WILLNEED'):
+            self.map.madvise(mmap.MADV_WILLNEED)
+        for offset in range(0, len(self.map), mmap.PAGESIZE):
+            self.map[offset]
+
+    def probe(self, key):
+        """
+        :param key: position key
+        :return: (depth, value, flag, move) or None
+        """
+        self.probes += 1
+        i = key % (self.size // 2) * 2
+        for offset in (HEADER.size + i * RECORD.size, HEADER.size + (i + 1) * RECORD.size):
+            slot_key, value, move, depth, flag = RECORD.unpack_from(self.map, offset)
+            if slot_key == key:
+                self.hits += 1
+                return depth, value, flag, None if move == -1 else move
+        return None
+
+    def hit_rate(self):
+        """
+        :return: share of probes that found their key
+        """
+        return self.hits / self.probes if self.probes else 0.0
+
+    def close(self):
+        self.map.close()